@@ -3,9 +3,9 @@ import streamlit as st
 import lasio as ls
 import pandas as pd
 import io
-import missingno as msno
 import matplotlib.pyplot as plt
 from sklearn.impute import SimpleImputer
+from las_nullity import draw_nullity_bar, draw_nullity_matrix, null_summary
 
 st.set_option('deprecation.showPyplotGlobalUse', False)
 
@@ -52,14 +52,16 @@ if u_file:
         else:
             st.write('Number of columns:', df.shape[1])
 
-        # Missingno
+        # Nullity views drawn from null fractions per depth bin instead of one cell per row
+        summary = null_summary(df)
         st.subheader('A nullity matrix')
-        msno.matrix(df)
-        st.pyplot()
+        st.pyplot(draw_nullity_matrix(summary))
 
         st.subheader('Nullity by column')
-        msno.bar(df)
-        st.pyplot()
+        st.pyplot(draw_nullity_bar(summary))
+        st.write(summary.counts_table())
+        st.write('Null intervals (longest first):')
+        st.dataframe(summary.intervals.sort_values('Samples', ascending=False).head(1000))
 
         # Columns selection
         st.subheader('Column selection')
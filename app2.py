@@ -1,74 +1,89 @@
 # Import the required libraries
 import streamlit as st
-import lasio as ls
 import pandas as pd
-import io
 import seaborn as sns
-import missingno as msno
 import matplotlib.pyplot as plt
-from sklearn.impute import SimpleImputer
-
-def read_las_file(u_file):
-    las_file_contents = u_file.read()
-    las_file_contents_str = las_file_contents.decode("utf-8")
-    las_file_buffer = io.StringIO(las_file_contents_str)
-    las = ls.read(las_file_buffer)
-    df = las.df()
-    df.reset_index(inplace=True)
-    df.index = df.index + 1
-    return df
-
-def display_main_data(df):
+from las_app import (define_derived_curves, display_compact_savings, display_export, display_parse_cache_stats,
+                     display_profile, draw_boxplots, hold_dataset, read_las_file, resample_depth, select_batch_well,
+                     start_las_file, start_profile)
+from las_cache import frame_hash
+from las_derived import derived_data_key, select_curve_stats, select_curves
+from las_nullity import draw_nullity_matrix, get_null_summary
+from las_plots import cached_figure_png, curve_envelope, interactive_well_logs, track_tiles
+from las_processing import CurveStats, fill_values, get_box_stats, get_curve_stats, get_depth_index
+
+# Sessions share the cached datasets read-only: with copy-on-write, column selections are views of
+# the shared curves, and a session's edits (dropna, imputation) copy only what they change
+pd.set_option('mode.copy_on_write', True)
+
+def display_main_data(dataset):
+    # Only the first and last rows are read for datasets reopened from the store
     st.header('Main Data')
     st.subheader('Header')
-    st.write(df.head())
+    st.write(dataset.head())
     st.subheader('Tail')
-    st.write(df.tail())
+    st.write(dataset.tail())
     st.subheader('Statistics')
-    st.write(df.describe())
+    st.write(get_curve_stats(dataset).describe())
     dim = st.radio('Data dimension:', ('Rows', 'Columns'), horizontal=True)
     if dim == 'Rows':
-        st.write('Number of rows: ', df.shape[0])
+        st.write('Number of rows: ', dataset.n_rows)
     else:
-        st.write('Number of columns:', df.shape[1])
+        st.write('Number of columns:', len(dataset.columns))
 
-def display_missingno_plots(df):
+def display_nullity_plots(dataset):
+    # Matrix drawn from null fractions per depth bin instead of one cell per row
     st.subheader('A nullity matrix')
-    msno.matrix(df)
-    st.pyplot()
+    summary = get_null_summary(dataset)
+    png = cached_figure_png(('nullity_matrix', dataset.key), lambda: draw_nullity_matrix(summary))
+    st.image(png, use_column_width=True)
 
-def select_columns(df):
+    with st.expander('Nulls by curve'):
+        st.write(summary.counts_table())
+        st.write('Null intervals (longest first):')
+        st.dataframe(summary.intervals.sort_values('Samples', ascending=False).head(1000))
+
+def select_columns(dataset):
     st.subheader('Column selection')
+    curves = define_derived_curves(dataset)
     selected_columns = st.multiselect('Select at least 03 columns you want to interact with, and include a depth column for log visualization purposes:', 
-                                      ['All columns'] + list(df.columns))
+                                      ['All columns'] + list(dataset.columns) + list(curves))
     if 'All columns' in selected_columns:
-        selected_columns = df.columns 
-    df_filtered = df[selected_columns]
-    return df_filtered, selected_columns
-
-def handle_null_values(df_filtered, selected_columns):
+        selected_columns = list(dataset.columns) + list(curves)
+    # Only the selected curves are materialized for datasets reopened from the on-disk store
+    df_filtered, errors = select_curves(dataset, selected_columns, curves)
+    for column, error in errors.items():
+        st.error(f'{column}: {error}')
+    selected_columns = [column for column in selected_columns if column not in errors]
+    return df_filtered, selected_columns, curves
+
+def handle_null_values(df_filtered, selected_columns, stats, data_key=None):
     st.subheader('What do you want to do with null values?')
     st.text('Please choose one. Delete null values or imputation methods.')
     st.text('By default, the imputation methods are applied automatically')
 
+    # The statistics of the selection are updated from the dropped or imputed values only
     delete_nulls = st.checkbox('Delete rows with null values in any column')
     if delete_nulls:
-        df_filtered = df_filtered.dropna()
+        complete = df_filtered.notna().all(axis=1)
+        dropped, df_filtered = df_filtered[~complete], df_filtered[complete]
+        stats = stats.drop_rows(dropped, df_filtered)
     else:
+        methods = {}
+        specific_values = {}
         for column in selected_columns:
             imputation_method = st.selectbox(f'Select imputation method for {column}:', ['Mean', 'Median', 'Specific Value'])
-            
-            if imputation_method == 'Mean':
-                imputer = SimpleImputer(strategy='mean')
-                df_filtered[column] = imputer.fit_transform(df_filtered[[column]])
-            elif imputation_method == 'Median':
-                imputer = SimpleImputer(strategy='median')
-                df_filtered[column] = imputer.fit_transform(df_filtered[[column]])
-            elif imputation_method == 'Specific Value':
-                specific_value = st.number_input(f'Enter the specific value for {column}:')
-                df_filtered[column] = df_filtered[column].fillna(specific_value)
-
-    return df_filtered
+            methods[column] = imputation_method
+
+            if imputation_method == 'Specific Value':
+                specific_values[column] = st.number_input(f'Enter the specific value for {column}:')
+
+        # Fill values are memoized per curve and applied in a single fillna
+        fills = fill_values(df_filtered, methods, specific_values, data_key)
+        df_filtered = df_filtered.fillna(value=fills)
+        stats = stats.fill(fills, df_filtered)
+
+    return df_filtered, stats
 
 def display_selected_data(df_filtered):
     st.title('Selected Data')
@@ -79,31 +94,41 @@ def display_selected_data(df_filtered):
     else:
         st.write('Number of columns:', df_filtered.shape[1])
 
+def select_depth_window(df_filtered, stats, depth_column):
+    # Restrict the following views to a depth interval: a binary search on the depth index gives a
+    # zero-copy row slice, so plots and statistics cost the size of the window, not of the well
+    if df_filtered.empty or depth_column not in df_filtered.columns:
+        return df_filtered, stats
+    top, base = stats.range(depth_column)
+    if not top < base:
+        return df_filtered, stats
+
+    window = st.slider(f'Depth window ({depth_column}):', min_value=float(top), max_value=float(base),
+                       value=(float(top), float(base)), key='depth_window')
+    if window == (top, base):
+        return df_filtered, stats
+    df_window = get_depth_index(df_filtered, depth_column).window(df_filtered, *window)
+    return df_window, CurveStats.from_frame(df_window)
+
 def display_boxplots(df_filtered):
     st.title('Boxplots')
-    red_circle = dict(markerfacecolor='red', marker='o', markeredgecolor='white')
 
     # Allow the user to select logarithmic columns
     log_columns = st.multiselect('Select logarithmic columns:', df_filtered.columns)
 
-    # Create box plots using Streamlit and Matplotlib
-    fig, axs = plt.subplots(1, len(df_filtered.columns), figsize=(30, 10))
-
-    for i, ax in enumerate(axs.flat):
-        ax.boxplot(df_filtered.iloc[:, i], flierprops=red_circle)
-        ax.set_title(df_filtered.columns[i], fontsize=20, fontweight='bold')
-        ax.tick_params(axis='y', labelsize=14)
-
-        # Check if column names match the expected logarithmic columns
-        if df_filtered.columns[i] in log_columns:
-            ax.semilogy()
+    approximate = st.checkbox('Approximate quartiles (faster on large files)', key='approximate_quartiles')
 
-    plt.tight_layout()
+    # Statistics and the figure are cached separately: changing the log columns only redraws
+    data_key = frame_hash(df_filtered)
+    box_stats = get_box_stats(df_filtered, data_key, approximate)
+    key = ('boxplot', data_key, tuple(df_filtered.columns), tuple(log_columns), approximate)
+    png = cached_figure_png(key, lambda: draw_boxplots(box_stats, log_columns))
 
     # Show the plot in Streamlit
-    st.pyplot(fig)
+    st.image(png, use_column_width=True)
 
-def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None, ylim=None, color_palette='colorblind'):
+def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None, ylim=None, color_palette='colorblind',
+                   full_resolution=False):
 
     if log_scale_columns is None:
         log_scale_columns = []
@@ -119,10 +144,20 @@ def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None,
     # Obtener la paleta de colores
     colors = sns.color_palette(color_palette, n_colors=len(x_columns))
 
+    # Only the samples inside the depth range are drawn (a binary search on the depth index),
+    # reduced to the min/max of each pixel row, taken from the curve's pyramid on long ranges
+    window = get_depth_index(df, y_column).rows(*ylim)
+    n_buckets = int(fig.get_figheight() * fig.dpi)
+
     for i, column in enumerate(x_columns):
         ax = axes [i]
 
-        ax.plot(df[column], y_column, data=df, color=colors[i], linewidth=0.5) 
+        if full_resolution:
+            x, y = df[column].to_numpy()[window], df[y_column].to_numpy()[window]
+        else:
+            y, x = curve_envelope(df, column, y_column, window, n_buckets)
+
+        ax.plot(x, y, color=colors[i], linewidth=0.5) 
         ax.set_xlim(xlims.get(column, (df[column].min(), df[column].max())))
 
         if column in log_scale_columns:
@@ -144,7 +179,7 @@ def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None,
 
     return fig, axes
 
-def display_log_data_viz(df_filtered):
+def display_log_data_viz(df_filtered, stats):
     st.title('Log Data Viz')
     if not df_filtered.empty:
         default_x_columns = df_filtered.columns[1:3].tolist()
@@ -159,19 +194,42 @@ def display_log_data_viz(df_filtered):
 
         for x_column in x_columns:
             st.write(f'You have selected: {x_column}')
-            min_value = st.number_input(f'Enter the minimum value for {x_column}:', value=round(df[x_column].min(), 2), step=0.01)
-            max_value = st.number_input(f'Enter the maximum value for {x_column}:', value=round(df[x_column].max(), 2), step=0.01)
+            # Ranges come from the precomputed statistics instead of scanning the column again
+            column_min, column_max = stats.range(x_column)
+            min_value = st.number_input(f'Enter the minimum value for {x_column}:', value=round(column_min, 2), step=0.01)
+            max_value = st.number_input(f'Enter the maximum value for {x_column}:', value=round(column_max, 2), step=0.01)
             xlims[x_column] = (min_value, max_value)
             st.write(f'Selected range for {x_column}: {min_value} to {max_value}')
 
         st.write(f'You have selected: {y_column}')
-        min_value = st.number_input(f'Enter the minimum value for {y_column}:', value=round(df[y_column].min(), 2), step=0.01)
-        max_value = st.number_input(f'Enter the maximum value for {y_column}:', value=round(df[y_column].max(), 2), step=0.01)
+        column_min, column_max = stats.range(y_column)
+        min_value = st.number_input(f'Enter the minimum value for {y_column}:', value=round(column_min, 2), step=0.01)
+        max_value = st.number_input(f'Enter the maximum value for {y_column}:', value=round(column_max, 2), step=0.01)
         ylim = (max_value, min_value)
         st.write(f'Selected range for {y_column}: {min_value} to {max_value}')
 
-        fig, axes = plot_well_logs(df_filtered, x_columns, y_column, log_scale_columns, xlims, ylim)
-        st.pyplot(fig)
+        renderer = st.radio('Renderer:', ['Static image', 'Interactive (zoom and pan in the browser)'],
+                            key='renderer', horizontal=True)
+
+        color_palette = 'colorblind'
+        data_key = frame_hash(df_filtered, [y_column] + x_columns)
+
+        if renderer == 'Static image':
+            full_resolution = st.checkbox('Render every sample (slow on large files)', key='full_resolution')
+
+            # The figure is only drawn again when the data or one of the plot parameters changes
+            key = ('well_logs', data_key, tuple(x_columns), y_column, tuple(log_scale_columns),
+                   tuple(xlims.items()), ylim, color_palette, full_resolution)
+            png = cached_figure_png(key, lambda: plot_well_logs(df_filtered, x_columns, y_column, log_scale_columns,
+                                                                xlims, ylim, color_palette, full_resolution)[0])
+            st.image(png, use_column_width=True)
+        else:
+            # The decimated tracks of the selected depth range are sent once; zooming and panning
+            # happen client-side, and a new range only re-decimates that range on the server
+            st.caption('Drag to pan, scroll to zoom, double-click to reset. Narrow the depth range above for more detail.')
+            tiles = track_tiles(df_filtered, x_columns, y_column, ylim,
+                                ('tiles', data_key, tuple(x_columns), y_column, ylim))
+            st.altair_chart(interactive_well_logs(tiles, x_columns, log_scale_columns, xlims, ylim, color_palette))
 
 # Streamlit App
 st.set_option('deprecation.showPyplotGlobalUse', False)
@@ -179,26 +237,51 @@ st.title('File Data Explorer')
 st.text('This is a web app to allow exploration of las format file')
 
 # Setup
-u_file = st.file_uploader('Upload a las file format')
-
-if u_file is not None:
-    df = read_las_file(u_file)
-    display_main_data(df)
-    display_missingno_plots(df)
-
-    df_filtered, selected_columns = select_columns(df)
+profile, profiling = start_profile()
+batch_mode = st.checkbox('Batch mode: load many LAS files or a zip archive')
+if batch_mode:
+    u_files = st.file_uploader('Upload las files or zip archives', accept_multiple_files=True)
+    with profile.stage('select_batch_well'):
+        dataset = select_batch_well(u_files)
+else:
+    u_file = st.file_uploader('Upload a las file format')
+    compact = st.checkbox('Compact mode: store curves as float32 to halve memory on large files')
+    with profile.stage('start_las_file'):
+        job = start_las_file(u_file, compact) if u_file is not None else None
+    # Not traced: waiting on the background parse would hold the stage lock for the whole parse
+    with profile.stage('read_las_file', traced=False):
+        dataset = read_las_file(job) if job is not None else None
+hold_dataset(dataset)
+
+if dataset is not None:
+    profile.context.update(well=dataset.key, rows=dataset.n_rows, curves=len(dataset.columns))
+    display_parse_cache_stats()
+    if not batch_mode and compact:
+        display_compact_savings(dataset)
+    with profile.stage('display_main_data'):
+        display_main_data(dataset)
+    with profile.stage('display_nullity_plots'):
+        display_nullity_plots(dataset)
+
+    with profile.stage('select_columns'):
+        df_filtered, selected_columns, curves = select_columns(dataset)
     
 
     if not df_filtered.empty:
-        df_filtered = handle_null_values(df_filtered, selected_columns)
-        display_selected_data(df_filtered)
-        display_boxplots(df_filtered)
-        display_log_data_viz(df_filtered)
-
-
-
-
-
-
-
-    
\ No newline at end of file
+        with profile.stage('resample_depth'):
+            stats = select_curve_stats(dataset, df_filtered.columns, curves, df_filtered)
+            df_filtered, stats, data_key = resample_depth(df_filtered, stats, dataset.columns[0],
+                                                          derived_data_key(dataset.key, curves))
+        with profile.stage('handle_null_values'):
+            df_filtered, stats = handle_null_values(df_filtered, selected_columns, stats, data_key)
+            display_selected_data(df_filtered)
+        with profile.stage('select_depth_window'):
+            df_filtered, stats = select_depth_window(df_filtered, stats, dataset.columns[0])
+        with profile.stage('display_export'):
+            display_export(df_filtered, dataset.header, dataset.columns[0])
+        with profile.stage('display_boxplots'):
+            display_boxplots(df_filtered)
+        with profile.stage('display_log_data_viz'):
+            display_log_data_viz(df_filtered, stats)
+
+display_profile(profile, profiling)
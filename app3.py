@@ -1,121 +1,146 @@
 # Import the required Libraries
 import streamlit as st
-import lasio as ls
 import pandas as pd
-import io
-from sklearn.impute import SimpleImputer
 import matplotlib.pyplot as plt
 import seaborn as sns
-import missingno as msno
-
-def read_las_file(u_file):
-    las_file_contents = u_file.read()
-    las_file_contents_str = las_file_contents.decode("utf-8")
-    las_file_buffer = io.StringIO(las_file_contents_str)
-    las = ls.read(las_file_buffer)
-    df = las.df()
-    df.reset_index(inplace=True)
-    df.index = df.index + 1
-    return df
+from las_app import (define_derived_curves, display_compact_savings, display_export, display_parse_cache_stats,
+                     display_profile, draw_boxplots, hold_dataset, read_las_file, resample_depth, select_batch_well,
+                     start_las_file, start_profile)
+from las_cache import frame_hash
+from las_derived import derived_data_key, select_curve_stats, select_curves
+from las_nullity import draw_nullity_matrix, get_null_summary
+from las_plots import cached_figure_png, curve_envelope, interactive_well_logs, track_tiles
+from las_processing import CurveStats, fill_values, get_box_stats, get_curve_stats, get_depth_index
+
+# Sessions share the cached datasets read-only: with copy-on-write, column selections are views of
+# the shared curves, and a session's edits (dropna, imputation) copy only what they change
+pd.set_option('mode.copy_on_write', True)
 
 # Function for data exploration
-def explore_data(df):
+def explore_data(dataset):
+    # Overview of the whole well, only drawn on the 'Explore Data' page
     st.header('Main Data')
 
-    # Display first and last rows
+    # Display first and last rows; only these rows are read for datasets reopened from the store
     st.subheader('First Rows')
-    st.write(df.head())
+    st.write(dataset.head())
     st.subheader('Last Rows')
-    st.write(df.tail())
+    st.write(dataset.tail())
     st.subheader('Statistics')
-    st.write(df.describe())
+    st.write(get_curve_stats(dataset).describe())
     dim = st.radio('Data dimension:', ('Rows', 'Columns'), horizontal=True)
     if dim == 'Rows':
-        st.write('Number of rows: ', df.shape[0])
+        st.write('Number of rows: ', dataset.n_rows)
     else:
-        st.write('Number of columns:', df.shape[1])
+        st.write('Number of columns:', len(dataset.columns))
     
-    # Missingno
+    # Nullity matrix drawn from null fractions per depth bin instead of one cell per row
     st.subheader('A nullity matrix')
-    msno.matrix(df)
-    st.pyplot()
-
-    # Columns selection
+    summary = get_null_summary(dataset)
+    png = cached_figure_png(('nullity_matrix', dataset.key), lambda: draw_nullity_matrix(summary))
+    st.image(png, use_column_width=True)
+
+    with st.expander('Nulls by curve'):
+        st.write(summary.counts_table())
+        st.write('Null intervals (longest first):')
+        st.dataframe(summary.intervals.sort_values('Samples', ascending=False).head(1000))
+
+def select_data(dataset, preview=False):
+    # Column selection and missing values handling, shared by every page so the choices survive
+    # page switches
     st.subheader('Column selection')
+    curves = define_derived_curves(dataset)
     #selected_columns = st.multiselect('Select at least 03 columns you want to interact with, and include a depth column for log visualization purposes:', ['All columns'] + list(df.columns))
     selected_columns = st.multiselect('Select at least 03 columns you want to interact with, and include a depth column for log visualization purposes:', 
-                                      list(df.columns))
+                                      list(dataset.columns) + list(curves))
     
     # Verify if "All columns" is in selected columns
     #if 'All columns' in selected_columns:
         #selected_columns = df.columns 
 
-    # Filter the original DataFrame based on the selected columns
-    df_filtered = df[selected_columns]
+    # Filter the original DataFrame based on the selected columns; only these curves are
+    # materialized for datasets reopened from the on-disk store
+    df_filtered, errors = select_curves(dataset, selected_columns, curves)
+    for column, error in errors.items():
+        st.error(f'{column}: {error}')
+    selected_columns = [column for column in selected_columns if column not in errors]
+    stats = select_curve_stats(dataset, selected_columns, curves, df_filtered)
 
     if selected_columns:
+        df_filtered, stats, data_key = resample_depth(df_filtered, stats, dataset.columns[0],
+                                                      derived_data_key(dataset.key, curves))
+
         # Remove rows with null values or impute values
         st.subheader('What do you want to do with missing values?')
         operation_choice = st.radio('Choose operation:', ['Remove rows containing missing values', 'Impute missing values'], index=1)
 
+        # The statistics of the selection are updated from the dropped or imputed values only
         if operation_choice == 'Remove rows containing missing values':
-            df_filtered = df_filtered.dropna()
+            complete = df_filtered.notna().all(axis=1)
+            dropped, df_filtered = df_filtered[~complete], df_filtered[complete]
+            stats = stats.drop_rows(dropped, df_filtered)
             
         else:
             # Imputation of values
             imputation_method = st.selectbox('Select global imputation method:', ['Mean', 'Median', 'Specific Value', 'Zero'],
                                          help="Choose a method to fill missing values for all selected columns.")
 
-            if imputation_method == 'Zero':
-                df_filtered[selected_columns] = df_filtered[selected_columns].fillna(0)
-            else:
+            methods = {column: imputation_method for column in selected_columns}
+            specific_values = {}
+            if imputation_method == 'Specific Value':
                 for column in selected_columns:
-                    if imputation_method == 'Mean':
-                        imputer = SimpleImputer(strategy='mean')
-                        df_filtered[column] = imputer.fit_transform(df_filtered[[column]])
-                    elif imputation_method == 'Median':
-                        imputer = SimpleImputer(strategy='median')
-                        df_filtered[column] = imputer.fit_transform(df_filtered[[column]])
-                    elif imputation_method == 'Specific Value':
-                        specific_value = st.number_input(f'Enter the specific value for {column}:')
-                        df_filtered[column] = df_filtered[column].fillna(specific_value)
+                    specific_values[column] = st.number_input(f'Enter the specific value for {column}:')
 
+            # Fill values are memoized per curve and applied in a single fillna
+            fills = fill_values(df_filtered, methods, specific_values, data_key)
+            df_filtered = df_filtered.fillna(value=fills)
+            stats = stats.fill(fills, df_filtered)
 
-        # Display the filtered DataFrame
-        st.title('Selected Data')
-        st.write(df_filtered.head())
 
-    return df_filtered, selected_columns
+        # Display the filtered DataFrame
+        if preview:
+            st.title('Selected Data')
+            st.write(df_filtered.head())
+
+    return df_filtered, selected_columns, stats
+
+def select_depth_window(df_filtered, stats, depth_column):
+    # Restrict the following views to a depth interval: a binary search on the depth index gives a
+    # zero-copy row slice, so plots and statistics cost the size of the window, not of the well
+    if df_filtered.empty or depth_column not in df_filtered.columns:
+        return df_filtered, stats
+    top, base = stats.range(depth_column)
+    if not top < base:
+        return df_filtered, stats
+
+    window = st.sidebar.slider(f'Depth window ({depth_column}):', min_value=float(top), max_value=float(base),
+                               value=(float(top), float(base)), key='depth_window')
+    if window == (top, base):
+        return df_filtered, stats
+    df_window = get_depth_index(df_filtered, depth_column).window(df_filtered, *window)
+    return df_window, CurveStats.from_frame(df_window)
 
 # Function for boxplot
 def boxplot(df_filtered):
-    # Configuration for the red circle in the boxplot
-    red_circle = dict(markerfacecolor='red', marker='o', markeredgecolor='white')
-
     # Create the Streamlit application
     st.title('Boxplots')
 
     # Allow the user to select logarithmic columns
     log_columns = st.multiselect('Select logarithmic columns:', df_filtered.columns)
 
-    # Create box plots 
-    fig, axs = plt.subplots(1, len(df_filtered.columns), figsize=(30, 10))
-
-    for i, ax in enumerate(axs.flat):
-        ax.boxplot(df_filtered.iloc[:, i], flierprops=red_circle)
-        ax.set_title(df_filtered.columns[i], fontsize=20, fontweight='bold')
-        ax.tick_params(axis='y', labelsize=14)
+    approximate = st.checkbox('Approximate quartiles (faster on large files)', key='approximate_quartiles')
 
-        # Check if column names match the expected logarithmic columns
-        if df_filtered.columns[i] in log_columns:
-            ax.semilogy()
-
-    plt.tight_layout()
+    # Statistics and the figure are cached separately: changing the log columns only redraws
+    data_key = frame_hash(df_filtered)
+    box_stats = get_box_stats(df_filtered, data_key, approximate)
+    key = ('boxplot', data_key, tuple(df_filtered.columns), tuple(log_columns), approximate)
+    png = cached_figure_png(key, lambda: draw_boxplots(box_stats, log_columns))
 
     # Show the plot in Streamlit
-    st.pyplot(fig)
+    st.image(png, use_column_width=True)
 
-def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None, ylim=None, color_palette='colorblind'):
+def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None, ylim=None, color_palette='colorblind',
+                   full_resolution=False):
 
     if log_scale_columns is None:
         log_scale_columns = []
@@ -131,10 +156,20 @@ def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None,
     # Get the color palette
     colors = sns.color_palette(color_palette, n_colors=len(x_columns))
 
+    # Only the samples inside the depth range are drawn (a binary search on the depth index),
+    # reduced to the min/max of each pixel row, taken from the curve's pyramid on long ranges
+    window = get_depth_index(df, y_column).rows(*ylim)
+    n_buckets = int(fig.get_figheight() * fig.dpi)
+
     for i, column in enumerate(x_columns):
         ax = axes [i]
 
-        ax.plot(df[column], y_column, data=df, color=colors[i], linewidth=0.5) 
+        if full_resolution:
+            x, y = df[column].to_numpy()[window], df[y_column].to_numpy()[window]
+        else:
+            y, x = curve_envelope(df, column, y_column, window, n_buckets)
+
+        ax.plot(x, y, color=colors[i], linewidth=0.5) 
         ax.set_xlim(xlims.get(column, (df[column].min(), df[column].max())))
 
         if column in log_scale_columns:
@@ -156,7 +191,7 @@ def plot_well_logs(df, x_columns, y_column, log_scale_columns=None, xlims=None,
 
     return fig, axes
 
-def display_log_data_viz(df_filtered):
+def display_log_data_viz(df_filtered, stats):
     st.title('Log Data Viz')
     if not df_filtered.empty:
 
@@ -171,19 +206,42 @@ def display_log_data_viz(df_filtered):
 
         for x_column in x_columns:
             st.write(f'You have selected: {x_column}')
-            min_value = st.number_input(f'Enter the minimum value for {x_column}:', value=round(df[x_column].min(), 2), step=0.01)
-            max_value = st.number_input(f'Enter the maximum value for {x_column}:', value=round(df[x_column].max(), 2), step=0.01)
+            # Ranges come from the precomputed statistics instead of scanning the column again
+            column_min, column_max = stats.range(x_column)
+            min_value = st.number_input(f'Enter the minimum value for {x_column}:', value=round(column_min, 2), step=0.01)
+            max_value = st.number_input(f'Enter the maximum value for {x_column}:', value=round(column_max, 2), step=0.01)
             xlims[x_column] = (min_value, max_value)
             st.write(f'Selected range for {x_column}: {min_value} to {max_value}')
 
         st.write(f'You have selected: {y_column}')
-        min_value = st.number_input(f'Enter the minimum value for {y_column}:', value=round(df[y_column].min(), 2), step=0.01)
-        max_value = st.number_input(f'Enter the maximum value for {y_column}:', value=round(df[y_column].max(), 2), step=0.01)
+        column_min, column_max = stats.range(y_column)
+        min_value = st.number_input(f'Enter the minimum value for {y_column}:', value=round(column_min, 2), step=0.01)
+        max_value = st.number_input(f'Enter the maximum value for {y_column}:', value=round(column_max, 2), step=0.01)
         ylim = (max_value, min_value)
         st.write(f'Selected range for {y_column}: {min_value} to {max_value}')
 
-        fig, axes = plot_well_logs(df_filtered, x_columns, y_column, log_scale_columns, xlims, ylim)
-        st.pyplot(fig)
+        renderer = st.radio('Renderer:', ['Static image', 'Interactive (zoom and pan in the browser)'],
+                            key='renderer', horizontal=True)
+
+        color_palette = 'colorblind'
+        data_key = frame_hash(df_filtered, [y_column] + x_columns)
+
+        if renderer == 'Static image':
+            full_resolution = st.checkbox('Render every sample (slow on large files)', key='full_resolution')
+
+            # The figure is only drawn again when the data or one of the plot parameters changes
+            key = ('well_logs', data_key, tuple(x_columns), y_column, tuple(log_scale_columns),
+                   tuple(xlims.items()), ylim, color_palette, full_resolution)
+            png = cached_figure_png(key, lambda: plot_well_logs(df_filtered, x_columns, y_column, log_scale_columns,
+                                                                xlims, ylim, color_palette, full_resolution)[0])
+            st.image(png, use_column_width=True)
+        else:
+            # The decimated tracks of the selected depth range are sent once; zooming and panning
+            # happen client-side, and a new range only re-decimates that range on the server
+            st.caption('Drag to pan, scroll to zoom, double-click to reset. Narrow the depth range above for more detail.')
+            tiles = track_tiles(df_filtered, x_columns, y_column, ylim,
+                                ('tiles', data_key, tuple(x_columns), y_column, ylim))
+            st.altair_chart(interactive_well_logs(tiles, x_columns, log_scale_columns, xlims, ylim, color_palette))
 
 
 # Config Setup
@@ -198,36 +256,62 @@ st.text('Welcome to the LAS File Data Explorer web app. Upload a LAS file to get
 st.sidebar.title('Instructions')
 st.sidebar.write('1. Upload a LAS file.')
 st.sidebar.write('2. Choose an option from the sidebar navigation.')
-u_file = st.sidebar.file_uploader('Upload a las file format')
+profile, profiling = start_profile()
+batch_mode = st.sidebar.checkbox('Batch mode: load many LAS files or a zip archive')
+if batch_mode:
+    u_files = st.sidebar.file_uploader('Upload las files or zip archives', accept_multiple_files=True)
+else:
+    u_file = st.sidebar.file_uploader('Upload a las file format')
+    compact = st.sidebar.checkbox('Compact mode: store curves as float32 to halve memory on large files')
 
 # Sidebar navigation
 st.sidebar.title('Navigation')
 options = st.sidebar.radio('Select what you want to display:', ['Explore Data', 'Box Plot', 'Log Data Viz'])
 
 # Check if file has been uploaded
-if u_file is not None:
+dataset = None
+if batch_mode:
+    with profile.stage('select_batch_well'):
+        dataset = select_batch_well(u_files)
+elif u_file is not None:
     st.success('File uploaded successfully!')
-    df = read_las_file(u_file)
-
-    # Capture the filtered DataFrame from the explore_data function
-    df_filtered, selected_columns = explore_data(df)
-else:
+    with profile.stage('start_las_file'):
+        job = start_las_file(u_file, compact)
+    # Not traced: waiting on the background parse would hold the stage lock for the whole parse
+    with profile.stage('read_las_file', traced=False):
+        dataset = read_las_file(job)
+hold_dataset(dataset)
+
+if dataset is None:
     st.warning('Please upload a LAS file to begin.')
-    df_filtered = None  # Set df_filtered to None if the file is not uploaded
-
-# Navigation options
-if options == 'Explore Data':
-    pass  # No need to explicitly call the function as it's already invoked within the condition above
-elif options == 'Box Plot':
-    if u_file is None:
-        st.warning('Please upload a LAS file to view Box Plot.')
-    else:
-        boxplot(df_filtered)
-elif options == 'Log Data Viz':
-    if u_file is None:
-        st.warning('Please upload a LAS file to view Log Data Viz.')
-    else:
-        display_log_data_viz(df_filtered)
+    if options != 'Explore Data':
+        st.warning(f'Please upload a LAS file to view {options}.')
+else:
+    profile.context.update(well=dataset.key, rows=dataset.n_rows, curves=len(dataset.columns), page=options)
+    display_parse_cache_stats()
+    if not batch_mode and compact:
+        display_compact_savings(dataset)
+
+    # Navigation options: each page only computes the data it shows. The overview (rows,
+    # statistics, nullity) belongs to 'Explore Data'; the selection and depth window are
+    # shared by every page, and plots are only built on their own page
+    if options == 'Explore Data':
+        with profile.stage('explore_data'):
+            explore_data(dataset)
+    with profile.stage('select_data'):
+        df_filtered, selected_columns, stats = select_data(dataset, preview=options == 'Explore Data')
+    with profile.stage('select_depth_window'):
+        df_filtered, stats = select_depth_window(df_filtered, stats, dataset.columns[0])
+
+    if options == 'Explore Data' and not df_filtered.empty:
+        with profile.stage('display_export'):
+            display_export(df_filtered, dataset.header, dataset.columns[0])
+    elif options == 'Box Plot':
+        with profile.stage('boxplot'):
+            boxplot(df_filtered)
+    elif options == 'Log Data Viz':
+        with profile.stage('display_log_data_viz'):
+            display_log_data_viz(df_filtered, stats)
 
 # Footer with additional information or links
 st.sidebar.markdown('---')
@@ -235,3 +319,5 @@ st.sidebar.subheader('Additional Information')
 st.sidebar.write('For more information, please contact me at leocorbur@gmail.com or via ' 
                  '[LinkedIn](https://www.linkedin.com/in/leonelcortez/). ' 
                  'Also, I invite you to see my lastest projects on [GitHub](https://github.com/leocorbur).')
+
+display_profile(profile, profiling)
@@ -0,0 +1,62 @@
+# Compare peak RSS and wall time of the streaming LAS reader against the lasio path
+# Usage: python benchmarks/bench_las_reader.py path/to/file.las [more.las ...]
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+READERS = ['stream', 'lasio']
+
+
+def max_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_reader(reader, path, results):
+    # Each reader runs in a fresh process so peak RSS is not polluted by the previous one
+    from las_reader import parse_las_lasio, read_las_stream
+
+    # Like a Streamlit upload, the raw bytes are already in memory before parsing starts
+    with open(path, 'rb') as f:
+        u_file = io.BytesIO(f.read())
+    baseline = max_rss_mb()
+
+    start = time.perf_counter()
+    if reader == 'stream':
+        df, _ = read_las_stream(u_file)
+    else:
+        df, _ = parse_las_lasio(u_file.getvalue())
+    elapsed = time.perf_counter() - start
+
+    results.put({
+        'reader': reader,
+        'seconds': elapsed,
+        'peak_rss_mb': max_rss_mb() - baseline,
+        'df_mb': df.memory_usage(index=True).sum() / 1024 ** 2,
+        'shape': df.shape,
+    })
+
+def main(paths):
+    context = multiprocessing.get_context('spawn')
+    for path in paths:
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        print(f'{path} ({size_mb:.1f} MB)')
+        for reader in READERS:
+            results = context.Queue()
+            process = context.Process(target=run_reader, args=(reader, path, results))
+            process.start()
+            result = results.get()
+            process.join()
+            print(f"  {result['reader']:<7} {result['seconds']:8.2f} s   "
+                  f"peak RSS above upload {result['peak_rss_mb']:8.1f} MB   "
+                  f"DataFrame {result['df_mb']:8.1f} MB   rows x cols {result['shape']}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('Usage: python benchmarks/bench_las_reader.py path/to/file.las [more.las ...]')
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+# Render time of plot_well_logs versus sample count: decimated on first draw (pyramids built),
+# decimated again (pyramids cached) and at full resolution
+# Usage: python benchmarks/bench_plot_well_logs.py [samples ...]
+import io
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app3 runs as a bare script outside `streamlit run`, which leaves only the function definitions usable
+from app3 import plot_well_logs
+
+N_TRACKS = 10
+DEFAULT_SAMPLES = [10_000, 100_000, 1_000_000, 2_000_000]
+
+
+def synthetic_logs(n_samples):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({f'CURVE{i}': rng.normal(100, 20, n_samples).cumsum() / 100 for i in range(N_TRACKS)})
+    df.insert(0, 'DEPT', 1000 + np.arange(n_samples) * 0.1)
+    return df
+
+def render(df, full_resolution):
+    start = time.perf_counter()
+    fig, _ = plot_well_logs(df, list(df.columns[1:]), 'DEPT', full_resolution=full_resolution)
+    fig.savefig(io.BytesIO(), format='png')
+    plt.close(fig)
+    return time.perf_counter() - start
+
+def main(sample_counts):
+    print(f"{'samples':>10} {'decimated':>11} {'cached':>8} {'full':>9}")
+    for n_samples in sample_counts:
+        df = synthetic_logs(n_samples)
+        decimated = render(df, full_resolution=False)
+        cached = render(df, full_resolution=False)
+        full = render(df, full_resolution=True)
+        print(f'{n_samples:>10} {decimated:>10.2f}s {cached:>7.2f}s {full:>8.2f}s')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SAMPLES)
@@ -0,0 +1,98 @@
+# Time and peak memory of the explorer's core stages on synthetic LAS files, headless
+# Usage: python benchmarks/bench_suite.py [--samples 100000 1000000] [--curves 8] [--nulls 0.05]
+#                                         [--wrapped] [--no-memory] [--json timings.jsonl]
+import argparse
+import io
+import logging
+import multiprocessing
+import os
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_las import synthetic_las_bytes
+
+STAGES = ['read_las_file', 'statistics', 'nullity', 'imputation', 'boxplot', 'plot_well_logs']
+
+
+def run_stages(config, trace_memory, results):
+    # Runs in a fresh process, so every cache starts empty and memory tracing only sees this run.
+    # The apps are imported as bare scripts: outside `streamlit run` every st call is a no-op and
+    # widgets return their defaults (Mean imputation, no rows dropped)
+    logging.disable(logging.WARNING)
+    import matplotlib.pyplot as plt
+    from app2 import handle_null_values
+    from app3 import draw_boxplots, plot_well_logs
+    from las_nullity import draw_nullity_matrix, null_summary
+    from las_processing import CurveStats, box_stats
+    from las_profile import MemoryTracing, RerunProfile
+    from las_reader import parse_las
+
+    las_bytes = synthetic_las_bytes(config['samples'], config['curves'], config['nulls'], config['wrapped'])
+    tracing = MemoryTracing() if trace_memory else None
+    profile = RerunProfile()
+
+    def render(fig):
+        fig.savefig(io.BytesIO(), format='png')
+        plt.close(fig)
+
+    with profile.stage('read_las_file'):
+        df, _ = parse_las(io.BytesIO(las_bytes))
+    with profile.stage('statistics'):
+        stats = CurveStats.from_frame(df)
+        stats.describe()
+    with profile.stage('nullity'):
+        render(draw_nullity_matrix(null_summary(df)))
+    with profile.stage('imputation'):
+        df_filled, stats = handle_null_values(df, list(df.columns), stats)
+    with profile.stage('boxplot'):
+        render(draw_boxplots(box_stats(df_filled), []))
+    with profile.stage('plot_well_logs'):
+        render(plot_well_logs(df_filled, list(df.columns[1:]), df.columns[0])[0])
+
+    del tracing
+    results.put(profile.records)
+
+def run_config(config, trace_memory):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_stages, args=(config, trace_memory, results))
+    process.start()
+    records = results.get()
+    process.join()
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the LAS explorer stages on synthetic files')
+    parser.add_argument('--samples', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--curves', type=int, default=8)
+    parser.add_argument('--nulls', type=float, default=0.05, help='fraction of null samples per curve')
+    parser.add_argument('--wrapped', action='store_true', help='write wrapped ~A rows')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced-memory pass')
+    parser.add_argument('--json', help='append the results to this JSON lines file')
+    args = parser.parse_args()
+
+    from las_profile import append_profile_log
+
+    print(f"{'samples':>10} {'curves':>6} {'stage':>15} {'seconds':>8} {'peak MB':>8}")
+    for n_samples in args.samples:
+        config = {'samples': n_samples, 'curves': args.curves, 'nulls': args.nulls, 'wrapped': args.wrapped}
+        # Times come from an untraced run: tracemalloc slows allocations down
+        timings = run_config(config, trace_memory=False)
+        peaks = run_config(config, trace_memory=True) if not args.no_memory else [{}] * len(timings)
+
+        records = []
+        for timing, peak in zip(timings, peaks):
+            record = {**config, 'stage': timing['stage'], 'seconds': timing['seconds'], 'peak_mb': peak.get('peak_mb')}
+            records.append(record)
+            peak_mb = '-' if record['peak_mb'] is None else f"{record['peak_mb']:.1f}"
+            print(f"{n_samples:>10} {args.curves:>6} {record['stage']:>15} {record['seconds']:>8.3f} {peak_mb:>8}")
+        append_profile_log(records, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Memory saved by compact mode and the error it introduces in the curve statistics and the log
+# tracks, against the full-precision float64 curves
+# Usage: python benchmarks/check_compact_error.py [path/to/file.las]
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from las_plots import curve_envelope
+from las_processing import CurveStats, box_stats
+from las_reader import compact_frame, parse_las
+
+# float32 keeps 24 bits of mantissa: values are within 2**-24 of the original, relative to their
+# magnitude. Statistics and drawn points are allowed a little slack above that
+MAX_RELATIVE_ERROR = 1e-6
+N_PIXELS = 1000
+
+
+def synthetic_curves(n_samples=1_000_000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'DEPT': 1000 + np.arange(n_samples) * 0.1524,
+        'GR': rng.gamma(4, 20, n_samples),
+        'RHOB': rng.normal(2.45, 0.1, n_samples),
+        'ILD': np.exp(rng.normal(1, 1.5, n_samples)),
+        'ZONE': np.repeat(np.arange(10), -(-n_samples // 10))[:n_samples].astype(np.float64),
+    })
+    df.loc[rng.choice(n_samples, n_samples // 20, replace=False), ['GR', 'ILD']] = np.nan
+    return df
+
+def relative_error(expected, actual, scale):
+    expected, actual = np.asarray(expected, dtype=np.float64), np.asarray(actual, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        error = np.abs(actual - expected) / scale
+    return float(np.nanmax(error)) if np.any(~np.isnan(error)) else 0.0
+
+def main(df):
+    compact = compact_frame(df)
+    full_bytes = df.memory_usage(index=True).sum()
+    compact_bytes = compact.memory_usage(index=True).sum()
+    print(f'{len(df)} rows x {len(df.columns)} curves: {full_bytes / 1024 ** 2:.1f} MB -> '
+          f'{compact_bytes / 1024 ** 2:.1f} MB ({1 - compact_bytes / full_bytes:.0%} saved)')
+    print('dtypes:', ', '.join(f'{column}={dtype}' for column, dtype in compact.dtypes.items()))
+
+    # Errors are relative to each curve's largest magnitude, the scale at which it is plotted
+    numeric = df.select_dtypes('number')
+    scale = numeric.abs().max()
+    full, small = CurveStats.from_frame(df).describe(), CurveStats.from_frame(compact).describe()
+    errors = {'statistics': max(relative_error(full[c], small[c], scale[c]) for c in numeric.columns)}
+
+    full_boxes, small_boxes = box_stats(numeric), box_stats(compact[numeric.columns])
+    errors['boxplots'] = max(relative_error([full_boxes[c][k] for k in ('q1', 'med', 'q3', 'whislo', 'whishi')],
+                                            [small_boxes[c][k] for k in ('q1', 'med', 'q3', 'whislo', 'whishi')],
+                                            scale[c]) for c in numeric.columns)
+
+    depth = numeric.columns[0]
+    track_errors = []
+    for column in numeric.columns[1:]:
+        _, full_values = curve_envelope(df, column, depth, slice(0, len(df)), N_PIXELS)
+        _, small_values = curve_envelope(compact, column, depth, slice(0, len(df)), N_PIXELS)
+        track_errors.append(relative_error(full_values, small_values, scale[column]))
+    errors['log tracks'] = max(track_errors, default=0.0)
+
+    for name, error in errors.items():
+        print(f'{name:>12}: max relative error {error:.2e}')
+    assert max(errors.values()) <= MAX_RELATIVE_ERROR, 'compact mode error above the bound'
+    print(f'all errors within {MAX_RELATIVE_ERROR:.0e}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            main(parse_las(io.BytesIO(f.read()))[0])
+    else:
+        main(synthetic_curves())
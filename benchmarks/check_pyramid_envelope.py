@@ -0,0 +1,90 @@
+# Checks that the track envelope drawn from the min/max pyramid matches the full-resolution
+# min/max of every pixel row, on random curves with spikes and null runs and random depth windows
+# Usage: python benchmarks/check_pyramid_envelope.py [samples] [windows]
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from las_plots import curve_envelope
+from las_processing import get_depth_index
+from las_pyramid import CurvePyramid, PYRAMID_BASE_BIN
+
+N_PIXELS = 1000
+
+
+def synthetic_curve(n_samples, rng):
+    values = rng.normal(0, 1, n_samples).cumsum()
+    spikes = rng.choice(n_samples, n_samples // 5000 + 1, replace=False)
+    values[spikes] += rng.choice([-50, 50], len(spikes))
+    for start in rng.choice(n_samples, 20):
+        values[start:start + rng.integers(1, 5000)] = np.nan
+    return pd.DataFrame({'DEPT': 1000 + np.arange(n_samples) * 0.1, 'GR': values})
+
+def check_levels(values):
+    # Every level must hold the exact min/max of its bins
+    pyramid = CurvePyramid(values)
+    for size, minimum, maximum in pyramid.levels:
+        padded = np.full(len(minimum) * size, np.nan)
+        padded[:len(values)] = values
+        with np.errstate(invalid='ignore'):
+            expected_min = np.fmin.reduce(padded.reshape(-1, size), axis=1)
+            expected_max = np.fmax.reduce(padded.reshape(-1, size), axis=1)
+        assert np.array_equal(minimum, expected_min, equal_nan=True), f'level {size}: min'
+        assert np.array_equal(maximum, expected_max, equal_nan=True), f'level {size}: max'
+    return len(pyramid.levels)
+
+def pixel_extremes(depth, values, top, base):
+    rows = np.clip(((depth - top) / (base - top) * N_PIXELS).astype(np.int64), 0, N_PIXELS - 1)
+    minimum, maximum = np.full(N_PIXELS, np.inf), np.full(N_PIXELS, -np.inf)
+    present = ~np.isnan(values)
+    np.minimum.at(minimum, rows[present], values[present])
+    np.maximum.at(maximum, rows[present], values[present])
+    return minimum, maximum
+
+def widen(minimum, maximum):
+    # Extremes over each pixel row and its neighbours: a pyramid bin spans at most one pixel row
+    # of samples, so it can only leak into the adjacent ones
+    padded_min = np.pad(minimum, 1, constant_values=np.inf)
+    padded_max = np.pad(maximum, 1, constant_values=-np.inf)
+    return (np.minimum.reduce([padded_min[:-2], padded_min[1:-1], padded_min[2:]]),
+            np.maximum.reduce([padded_max[:-2], padded_max[1:-1], padded_max[2:]]))
+
+def check_window(df, top, base):
+    rows = get_depth_index(df, 'DEPT').rows(top, base)
+    depth, values = df['DEPT'].to_numpy(), df['GR'].to_numpy()
+    full_min, full_max = pixel_extremes(depth[rows], values[rows], top, base)
+    drawn_depth, drawn_values = curve_envelope(df, 'GR', 'DEPT', rows, N_PIXELS)
+    inside = (drawn_depth >= top) & (drawn_depth <= base)
+    drawn_min, drawn_max = pixel_extremes(drawn_depth[inside], drawn_values[inside], top, base)
+
+    # The drawn envelope never exceeds the data around a pixel row and always reaches its extremes
+    wide_min, wide_max = widen(full_min, full_max)
+    near_min, near_max = widen(drawn_min, drawn_max)
+    assert np.all(drawn_min >= wide_min) and np.all(drawn_max <= wide_max), 'envelope exceeds the data'
+    assert np.all(near_min <= full_min) and np.all(near_max >= full_max), 'envelope misses an extreme'
+    return len(drawn_values)
+
+def main(n_samples, n_windows):
+    rng = np.random.default_rng(0)
+    df = synthetic_curve(n_samples, rng)
+    levels = check_levels(df['GR'].to_numpy())
+    print(f'{levels} levels exact for {n_samples} samples')
+
+    points = []
+    depth = df['DEPT'].to_numpy()
+    for _ in range(n_windows):
+        # Windows from a few pixel rows of samples up to the whole well
+        length = rng.integers(PYRAMID_BASE_BIN * N_PIXELS // 4, n_samples)
+        start = rng.integers(0, n_samples - length)
+        points.append(check_window(df, depth[start], depth[start + length - 1]))
+    print(f'{n_windows} windows match the full-resolution envelope '
+          f'({min(points)}-{max(points)} points drawn per track)')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 1_000_000, args[1] if len(args) > 1 else 50)
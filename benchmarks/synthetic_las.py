@@ -0,0 +1,117 @@
+# Synthetic LAS 2.0 files of any size for the benchmarks: a regular depth curve plus random-walk
+# log curves, with null runs and optional wrapped ~A rows
+# Usage: python benchmarks/synthetic_las.py out.las [samples] [curves] [null_fraction] [--wrapped]
+import io
+import sys
+
+import numpy as np
+
+NULL_VALUE = -999.25
+DEPTH_START = 1000.0
+DEPTH_STEP = 0.1524
+
+# Mnemonic, unit, mean and spread of the curves, repeated with a suffix past the first few
+CURVE_TEMPLATES = [
+    ('GR', 'GAPI', 80.0, 20.0),
+    ('RHOB', 'G/C3', 2.4, 0.1),
+    ('NPHI', 'V/V', 0.25, 0.05),
+    ('ILD', 'OHMM', 10.0, 5.0),
+    ('DT', 'US/F', 90.0, 10.0),
+    ('SP', 'MV', -20.0, 15.0),
+    ('CALI', 'IN', 8.5, 0.5),
+    ('PEF', 'B/E', 3.0, 0.5),
+]
+
+# Values per line of a wrapped row, after the depth line
+WRAP_VALUES_PER_LINE = 5
+
+# Rows formatted at a time, which bounds the memory used by the generator
+WRITE_CHUNK_ROWS = 100_000
+
+
+def curve_specs(n_curves):
+    specs = []
+    for i in range(n_curves):
+        mnemonic, unit, mean, spread = CURVE_TEMPLATES[i % len(CURVE_TEMPLATES)]
+        if i >= len(CURVE_TEMPLATES):
+            mnemonic = f'{mnemonic}{i // len(CURVE_TEMPLATES)}'
+        specs.append((mnemonic, unit, mean, spread))
+    return specs
+
+def synthetic_values(n_samples, n_curves, null_fraction=0.05, seed=0):
+    # (n_samples, 1 + n_curves) array: depth, then smooth curves with a few spikes. Nulls come as
+    # runs of consecutive samples, as they do around casing points and tool changes
+    rng = np.random.default_rng(seed)
+    values = np.empty((n_samples, n_curves + 1))
+    values[:, 0] = DEPTH_START + np.arange(n_samples) * DEPTH_STEP
+    for j, (_, _, mean, spread) in enumerate(curve_specs(n_curves), start=1):
+        walk = rng.normal(0, 1, n_samples).cumsum()
+        walk = (walk - walk.mean()) / (walk.std() or 1)
+        values[:, j] = mean + spread * (0.7 * walk + 0.3 * rng.normal(0, 1, n_samples))
+        spikes = rng.choice(n_samples, max(1, n_samples // 10_000), replace=False)
+        values[spikes, j] += 5 * spread
+
+        nulls = int(n_samples * null_fraction)
+        while nulls > 0:
+            length = min(nulls, int(rng.integers(1, max(2, n_samples // 100))))
+            start = int(rng.integers(0, max(1, n_samples - length)))
+            values[start:start + length, j] = np.nan
+            nulls -= length
+    return values
+
+def las_header(n_samples, n_curves, wrapped=False):
+    stop = DEPTH_START + (n_samples - 1) * DEPTH_STEP
+    lines = [
+        '~VERSION INFORMATION',
+        ' VERS.                 2.0 : CWLS LOG ASCII STANDARD - VERSION 2.0',
+        f" WRAP.                 {'YES' if wrapped else 'NO'} : "
+        f"{'MULTIPLE LINES PER DEPTH STEP' if wrapped else 'ONE LINE PER DEPTH STEP'}",
+        '~WELL INFORMATION',
+        f' STRT.M        {DEPTH_START:.4f} : START DEPTH',
+        f' STOP.M        {stop:.4f} : STOP DEPTH',
+        f' STEP.M        {DEPTH_STEP:.4f} : STEP',
+        f' NULL.         {NULL_VALUE} : NULL VALUE',
+        ' COMP.         SYNTHETIC : COMPANY',
+        f' WELL.         SYNTHETIC {n_samples}x{n_curves} : WELL',
+        ' UWI .         000000000000 : UNIQUE WELL ID',
+        '~CURVE INFORMATION',
+        ' DEPT.M : DEPTH',
+    ]
+    lines += [f' {mnemonic}.{unit} : SYNTHETIC {mnemonic}' for mnemonic, unit, _, _ in curve_specs(n_curves)]
+    lines += ['~PARAMETER INFORMATION', ' BHT .DEGC   35.0 : BOTTOM HOLE TEMPERATURE', '~A']
+    return '\n'.join(lines) + '\n'
+
+def write_synthetic_las(out, n_samples, n_curves, null_fraction=0.05, wrapped=False, seed=0):
+    # out is a path or a binary stream
+    if isinstance(out, str):
+        with open(out, 'wb') as f:
+            return write_synthetic_las(f, n_samples, n_curves, null_fraction, wrapped, seed)
+
+    values = synthetic_values(n_samples, n_curves, null_fraction, seed)
+    values[np.isnan(values)] = NULL_VALUE
+    out.write(las_header(n_samples, n_curves, wrapped).encode('ascii'))
+    for start in range(0, n_samples, WRITE_CHUNK_ROWS):
+        chunk = values[start:start + WRITE_CHUNK_ROWS]
+        text = io.StringIO()
+        if wrapped:
+            for row in chunk:
+                text.write(f'{row[0]:.4f}\n')
+                for i in range(1, len(row), WRAP_VALUES_PER_LINE):
+                    text.write(' '.join(f'{value:.4f}' for value in row[i:i + WRAP_VALUES_PER_LINE]) + '\n')
+        else:
+            np.savetxt(text, chunk, fmt='%.4f')
+        out.write(text.getvalue().encode('ascii'))
+
+def synthetic_las_bytes(n_samples, n_curves, null_fraction=0.05, wrapped=False, seed=0):
+    buffer = io.BytesIO()
+    write_synthetic_las(buffer, n_samples, n_curves, null_fraction, wrapped, seed)
+    return buffer.getvalue()
+
+
+if __name__ == '__main__':
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        sys.exit('Usage: python benchmarks/synthetic_las.py out.las [samples] [curves] [null_fraction] [--wrapped]')
+    write_synthetic_las(args[0], int(args[1]) if len(args) > 1 else 100_000, int(args[2]) if len(args) > 2 else 8,
+                        float(args[3]) if len(args) > 3 else 0.05, '--wrapped' in flags)
@@ -0,0 +1,215 @@
+# Import the required libraries
+import streamlit as st
+import pandas as pd
+import matplotlib.pyplot as plt
+from las_batch import count_las_sources, iter_las_sources, parse_batch, reload_well
+from las_reader import DatasetLease, get_parse_cache, las_dataset_key, load_stored_dataset, start_las_dataset
+from las_derived import DERIVED_FUNCTIONS, parse_derived_curves
+from las_export import EXPORT_FORMATS, ExportedFile
+from las_profile import PROFILE_HISTORY_MAX_RECORDS, MemoryTracing, RerunProfile, append_profile_log, records_to_jsonl
+from las_resample import RESAMPLE_METHODS, get_depth_spacing, get_resampled
+
+# Parts shared by the Streamlit apps (app2.py, app3.py)
+
+
+def display_well_header(header):
+    # Well section and curve list, read before the curves themselves
+    st.subheader('Well header')
+    info = header.get('info', {}).get('well', {})
+    well = pd.DataFrame([(mnemonic, info.get(mnemonic, {}).get('unit', ''), value, info.get(mnemonic, {}).get('descr', ''))
+                         for mnemonic, value in header['well'].items()],
+                        columns=['Mnemonic', 'Unit', 'Value', 'Description']).astype(str)
+    st.dataframe(well, hide_index=True)
+    st.subheader('Curves')
+    curves = pd.DataFrame(header['curves']).rename(columns={'mnemonic': 'Mnemonic', 'unit': 'Unit', 'descr': 'Description'})
+    st.dataframe(curves, hide_index=True)
+
+def start_las_file(u_file, compact=False):
+    # Parsed data is cached by the content hash of the upload, so reruns skip lasio entirely.
+    # New uploads are parsed in a background thread: the header shows up at once, an interaction
+    # reruns the page without restarting the parse, and a replaced upload cancels it.
+    # Hashing a large upload takes seconds, so it is hashed once per upload instead of on every rerun
+    upload = (u_file.file_id, compact)
+    known = st.session_state.get('upload_key')
+    if known is None or known[0] != upload:
+        known = st.session_state['upload_key'] = (upload, las_dataset_key(u_file, compact))
+    ticket = start_las_dataset(u_file, compact, known[1])
+    current = st.session_state.get('parse_ticket')
+    if current is None or current.job is not ticket.job:
+        st.session_state['parse_ticket'] = ticket
+    return ticket.job
+
+def read_las_file(job):
+    # Waits for the job, showing the header and the progress of the parse meanwhile
+    if not job.done():
+        placeholder = st.empty()
+        with placeholder.container():
+            if job.header is not None:
+                display_well_header(job.header)
+            progress = st.progress(0.0, text='Parsing curves...')
+        while not job.done():
+            progress.progress(job.progress, text=f'Parsing curves... {job.progress:.0%}')
+            job.wait(0.1)
+        placeholder.empty()
+    return job.result()
+
+def select_batch_well(u_files):
+    # Parse every uploaded well in parallel, then let the user pick one from the combined index
+    if u_files and st.button('Parse files'):
+        total = count_las_sources(u_files)
+        progress = st.progress(0.0, text=f'Parsing {total} wells...')
+        index_table = st.empty()
+        rows = []
+
+        def report(done, name, row):
+            rows.append(row)
+            progress.progress(done / max(total, 1), text=f'Parsed {name} ({done}/{total})')
+            index_table.dataframe(pd.DataFrame(rows).drop(columns='Key'))
+
+        st.session_state['well_index'] = parse_batch(iter_las_sources(u_files), report)
+        progress.empty()
+        index_table.empty()
+
+    well_index = st.session_state.get('well_index')
+    if well_index is None:
+        return None
+
+    st.header('Well index')
+    st.dataframe(well_index.drop(columns='Key'))
+    wells = well_index[well_index['Error'].isna()]
+    if wells.empty:
+        return None
+    choice = st.selectbox('Select a well to explore:', wells.index,
+                          format_func=lambda i: f"{wells.at[i, 'Well']} ({wells.at[i, 'File']})")
+    key, name = wells.at[choice, 'Key'], wells.at[choice, 'File']
+    dataset = load_stored_dataset(key)
+    if dataset is None and u_files:
+        # Evicted from the cache without being stored: parse it again from the upload
+        dataset = reload_well(iter_las_sources(u_files), name, key)
+    if dataset is None:
+        # The upload is gone too: drop the stale entry from the index
+        st.session_state['well_index'] = well_index.drop(index=choice)
+        st.warning(f'{name} is no longer available; upload it and parse the files again to explore it')
+    return dataset
+
+def hold_dataset(dataset):
+    # The session leases the well it shows, so the shared cache keeps a single copy of it for
+    # every session showing it; replacing or dropping the lease releases the well
+    lease = st.session_state.get('dataset_lease')
+    if dataset is None:
+        # Also lets go of a parse still running for a removed upload
+        st.session_state.pop('dataset_lease', None)
+        st.session_state.pop('parse_ticket', None)
+    elif lease is None or lease.key != dataset.key:
+        st.session_state['dataset_lease'] = DatasetLease(dataset)
+
+def start_profile():
+    # Every stage of the run is timed; memory is only traced while the panel is shown
+    enabled = st.sidebar.checkbox('Show performance panel', key='performance_panel')
+    if enabled and 'memory_tracing' not in st.session_state:
+        st.session_state['memory_tracing'] = MemoryTracing()
+    elif not enabled:
+        st.session_state.pop('memory_tracing', None)
+    return RerunProfile(traced=enabled), enabled
+
+def display_profile(profile, enabled):
+    records = profile.finish()
+    append_profile_log(records)
+    if not enabled:
+        return
+    history = st.session_state.setdefault('profile_history', [])
+    history.extend(records)
+    del history[:-PROFILE_HISTORY_MAX_RECORDS]
+
+    with st.sidebar.expander('Performance', expanded=True):
+        st.dataframe(pd.DataFrame(records)[['stage', 'seconds', 'peak_mb']].round(3), hide_index=True)
+        st.caption(f'{len(history)} records this session. peak_mb is the traced peak of the whole process '
+                   'during the stage; sessions showing this panel run their stages one at a time')
+        st.download_button('Export timings (JSON lines)', records_to_jsonl(history),
+                           file_name='las_explorer_timings.jsonl', mime='application/json')
+
+def display_parse_cache_stats():
+    stats = get_parse_cache().stats()
+    st.sidebar.caption(f"Parse cache: {stats['hits']} hits, {stats['misses']} misses, "
+                       f"{stats['entries']} files ({stats['bytes'] / 1024 ** 2:.1f} MB), "
+                       f"{stats['pinned']} in use")
+
+def display_compact_savings(dataset):
+    saved = dataset.compact_saved_bytes
+    st.sidebar.caption(f'Compact mode saves {saved / 1024 ** 2:.1f} MB on this well '
+                       f'({saved / max(dataset.nbytes + saved, 1):.0%})')
+
+def define_derived_curves(dataset):
+    # Curves computed from the others, e.g. VSH = (GR - 20) / (120 - 20); they are selected like
+    # the curves of the file and only evaluated once something selects them
+    text = st.text_area('Derived curves (one per line, NAME = expression):', key='derived_curves',
+                        help='Arithmetic, comparisons and ' + ', '.join(DERIVED_FUNCTIONS) + ' over the curve '
+                             'mnemonics; write mnemonics such as GR:1 between backticks.')
+    curves, errors = parse_derived_curves(text, dataset.columns)
+    for error in errors:
+        st.error(error)
+    return curves
+
+def resample_depth(df_filtered, stats, depth_column, data_key):
+    # Optional regular depth grid for files with irregular spacing or merged runs; the views after
+    # it (imputation, statistics, plots) work on the resampled curves
+    if df_filtered.empty or depth_column not in df_filtered.columns:
+        return df_filtered, stats, data_key
+    spacing = get_depth_spacing(df_filtered, depth_column)
+    if spacing['regular']:
+        st.caption(f"Depth step: {spacing['step']:g} (regular)")
+    else:
+        st.caption(f"Depth step: {spacing['step']:g} (irregular, from {spacing['min']:g} to {spacing['max']:g})")
+
+    method = st.selectbox('Resample depth onto a regular grid:', ['Off'] + RESAMPLE_METHODS, key='resample_method')
+    if method == 'Off' or not spacing['step'] > 0:
+        return df_filtered, stats, data_key
+    step = st.number_input('Grid step:', min_value=0.0, value=spacing['step'], format='%g', key='resample_step')
+    try:
+        df_resampled, stats = get_resampled(df_filtered, depth_column, step, method, data_key)
+    except ValueError as e:
+        st.error(f'Cannot resample: {e}')
+        return df_filtered, stats, data_key
+    st.caption(f'{len(df_filtered)} samples resampled to {len(df_resampled)}')
+    return df_resampled, stats, f'{data_key}-{method}-{step!r}'
+
+def display_export(df_filtered, header, depth_column):
+    st.subheader('Export')
+    fmt = st.selectbox('Format:', list(EXPORT_FORMATS), key='export_format')
+    _, extension, mime = EXPORT_FORMATS[fmt]
+
+    # The depth curve goes first: it is the index curve of an exported LAS file
+    if depth_column in df_filtered.columns:
+        df_filtered = df_filtered[[depth_column] + [c for c in df_filtered.columns if c != depth_column]]
+
+    # Written chunk by chunk to a file, only when asked for, instead of on every rerun. The session
+    # keeps the file until its next export; the static file route streams it from disk
+    if st.button('Prepare export', key='prepare_export'):
+        export = st.session_state['export_file'] = ExportedFile(df_filtered, fmt, header)
+        label = f'Download {fmt} ({len(df_filtered)} rows, {export.nbytes / 1024 ** 2:.1f} MB)'
+        if st.get_option('server.enableStaticServing') and export.servable:
+            st.markdown(f'<a href="{export.url}" download="selection.{extension}">{label}</a>', unsafe_allow_html=True)
+        else:
+            # Without static serving (or above its size limit) the download button holds the payload
+            # in memory for the session
+            st.download_button(label, export.read(), file_name=f'selection.{extension}', mime=mime)
+            st.caption('Enable server.enableStaticServing to serve exports from disk instead of memory')
+
+def draw_boxplots(box_stats, log_columns):
+    red_circle = dict(markerfacecolor='red', marker='o', markeredgecolor='white')
+
+    # Create box plots using Streamlit and Matplotlib
+    fig, axs = plt.subplots(1, len(box_stats), figsize=(30, 10), squeeze=False)
+
+    # Boxes are drawn from precomputed statistics, with a capped number of fliers
+    for ax, (column, stats) in zip(axs.flat, box_stats.items()):
+        ax.bxp([stats], flierprops=red_circle)
+        ax.set_title(column, fontsize=20, fontweight='bold')
+        ax.tick_params(axis='y', labelsize=14)
+
+        # Check if column names match the expected logarithmic columns
+        if column in log_columns:
+            ax.semilogy()
+
+    plt.tight_layout()
+    return fig
@@ -0,0 +1,100 @@
+# Import the required libraries
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import pandas as pd
+from las_reader import LasDataset, get_parse_cache, las_content_hash, load_las_dataset, open_or_parse
+from las_store import has_dataset
+
+BATCH_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+WELL_INDEX_COLUMNS = ['Well', 'UWI', 'File', 'Top', 'Base', 'Step', 'Samples', 'Curves', 'Key', 'Error']
+
+
+def iter_las_sources(u_files):
+    # (name, bytes) for every uploaded LAS file, zip archives expanded one member at a time
+    for u_file in u_files:
+        if u_file.name.lower().endswith('.zip'):
+            with zipfile.ZipFile(u_file) as archive:
+                for member in archive.infolist():
+                    if not member.is_dir() and member.filename.lower().endswith('.las'):
+                        yield member.filename, archive.read(member)
+        else:
+            yield u_file.name, u_file.getvalue()
+
+def count_las_sources(u_files):
+    count = 0
+    for u_file in u_files:
+        if u_file.name.lower().endswith('.zip'):
+            with zipfile.ZipFile(u_file) as archive:
+                count += sum(1 for member in archive.infolist()
+                             if not member.is_dir() and member.filename.lower().endswith('.las'))
+        else:
+            count += 1
+    return count
+
+def _index_well(name, las_bytes):
+    # Runs in a worker process: parse (or reopen) the well and summarize it for the index
+    u_file = io.BytesIO(las_bytes)
+    key = las_content_hash(u_file)
+    row = dict.fromkeys(WELL_INDEX_COLUMNS)
+    row.update(File=name, Key=key)
+    try:
+        dataset = open_or_parse(key, u_file)
+    except Exception as error:
+        row['Error'] = str(error)
+        return row, None
+
+    depth = dataset.select([dataset.columns[0]]).iloc[:, 0]
+    well = dataset.header['well']
+    row.update(Well=well.get('WELL') or name, UWI=well.get('UWI'), Top=depth.min(), Base=depth.max(),
+               Step=well.get('STEP'), Samples=len(depth), Curves=', '.join(dataset.columns))
+
+    # Parsed wells reach the app through the on-disk store; the DataFrame itself is only sent
+    # back when the store could not be written
+    if has_dataset(key):
+        return row, None
+    return row, (dataset.df, dataset.header)
+
+def parse_batch(sources, progress=None, max_workers=BATCH_WORKERS):
+    # Parse many wells in a process pool and return the combined well index.
+    # progress(done, name, row) is called as each file finishes
+    rows = []
+    # Spawned workers avoid forking the multi-threaded Streamlit server
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        sources = iter(sources)
+        running = set()
+        while True:
+            # Only a couple of files per worker are held in memory at any time
+            for name, las_bytes in sources:
+                running.add(pool.submit(_index_well, name, las_bytes))
+                if len(running) >= 2 * max_workers:
+                    break
+            if not running:
+                break
+
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row, parsed = future.result()
+                if parsed is not None:
+                    df, header = parsed
+                    dataset = LasDataset(row['Key'], df, header)
+                    get_parse_cache().put(dataset.key, dataset, dataset.nbytes)
+                rows.append(row)
+                if progress is not None:
+                    progress(len(rows), row['File'], row)
+
+    return pd.DataFrame(rows, columns=WELL_INDEX_COLUMNS).astype({'Samples': 'Int64'})
+
+def reload_well(sources, name, key):
+    # Parse one well of the index again from its upload, e.g. after it was evicted from the parse
+    # cache without having been stored; None when the file is no longer among the sources
+    for source_name, las_bytes in sources:
+        if source_name == name:
+            u_file = io.BytesIO(las_bytes)
+            if las_content_hash(u_file) == key:
+                return load_las_dataset(u_file)
+    return None
@@ -0,0 +1,119 @@
+# Import the required libraries
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+class LruCache:
+    # Least-recently-used cache bounded by the total size (in bytes) of its entries. Pinned keys
+    # (e.g. datasets some session is showing) are skipped by eviction until they are unpinned
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pins = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            # Values bigger than the whole budget are returned to the caller but never stored
+            if nbytes > self.max_bytes:
+                return value
+
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+            return value
+
+    def _evict(self):
+        # Oldest unpinned entries go first; pinned ones never add up to more than the budget
+        for key in list(self._entries):
+            if self.current_bytes <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            self.current_bytes -= self._entries.pop(key)[1]
+            self.evictions += 1
+
+    def pin(self, key):
+        # Pins are counted, so every pin needs its own unpin. Pinned entries count against the budget
+        # like the others: a key is not pinned (False is returned) when it is not cached or when
+        # pinning it would keep more than the whole budget out of eviction's reach
+        with self._lock:
+            if key not in self._pins:
+                pinned_bytes = sum(self._entries[pinned][1] for pinned in self._pins if pinned in self._entries)
+                if key not in self._entries or pinned_bytes + self._entries[key][1] > self.max_bytes:
+                    return False
+            self._pins[key] = self._pins.get(key, 0) + 1
+            return True
+
+    def unpin(self, key):
+        with self._lock:
+            if self._pins.get(key, 0) > 1:
+                self._pins[key] -= 1
+            else:
+                self._pins.pop(key, None)
+                self._evict()
+
+    def get_or_create(self, key, factory, sizeof):
+        # The factory runs outside the lock so a slow build does not block other sessions
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value, sizeof(value))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'pinned': sum(1 for key in self._entries if key in self._pins),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def frame_hash(df, columns=None):
+    # Content hash of some DataFrame columns, used to key caches of values derived from them
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(df)).encode())
+    for column in (df.columns if columns is None else columns):
+        values = df[column].to_numpy()
+        if values.dtype.kind not in 'biufcmM':
+            values = pd.util.hash_pandas_object(df[column], index=False).to_numpy()
+        digest.update(str(column).encode())
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+    return digest.hexdigest()
@@ -0,0 +1,221 @@
+# Import the required libraries
+import ast
+import copy
+import hashlib
+import re
+import numpy as np
+import pandas as pd
+from las_cache import LruCache
+from las_processing import CurveStats, get_curve_stats
+
+# Budget for evaluated derived curves, shared by every session of the server
+DERIVED_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+_derived_cache = LruCache(DERIVED_CACHE_MAX_BYTES)
+
+# Statistics of a derived curve are a few Series of one value each
+DERIVED_STATS_BYTES = 4096
+
+# Functions usable in expressions, with their number of arguments; each one is applied to whole
+# curves at once
+DERIVED_FUNCTIONS = {
+    'log': (np.log, 1), 'log10': (np.log10, 1), 'exp': (np.exp, 1), 'sqrt': (np.sqrt, 1), 'abs': (np.abs, 1),
+    'minimum': (np.fmin, 2), 'maximum': (np.fmax, 2), 'clip': (np.clip, 3), 'where': (np.where, 3),
+}
+
+_FUNCTIONS = {name: function for name, (function, _) in DERIVED_FUNCTIONS.items()}
+
+# Arithmetic, comparisons (true is 1.0) and & | ~ to combine them; nothing else is compiled
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Constant, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd, ast.Invert, ast.BitAnd, ast.BitOr,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+# Mnemonics that are not Python names (GR:1, DT-S) are written between backticks
+_QUOTED_NAME = re.compile(r'`([^`]+)`')
+
+
+def _curve_names(tree):
+    # Name nodes of curves, leaving out those of the called functions
+    functions = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    return [node for node in ast.walk(tree) if isinstance(node, ast.Name) and id(node) not in functions]
+
+
+class DerivedCurve:
+    # NAME = expression over the curves of a well, checked and compiled once. key is the expression
+    # with earlier derived curves expanded, so the same curve under another name or spacing shares
+    # its cached values
+    def __init__(self, name, expression, tree):
+        self.name = name
+        self.expression = expression
+        self.tree = tree
+        self.key = ast.dump(tree)
+        self.inputs = sorted({node.id for node in _curve_names(tree)})
+
+        # Curves become positional variables: mnemonics need not be valid Python names
+        variables = {column: f'_{i}' for i, column in enumerate(self.inputs)}
+        code_tree = copy.deepcopy(tree)
+        for node in _curve_names(code_tree):
+            node.id = variables[node.id]
+        self.code = compile(code_tree, f'<derived curve {name}>', 'eval')
+
+    def evaluate(self, df):
+        namespace = {f'_{i}': df[column].to_numpy(dtype=np.float64) for i, column in enumerate(self.inputs)}
+        with np.errstate(all='ignore'):
+            values = eval(self.code, {'__builtins__': {}, **_FUNCTIONS}, namespace)
+        values = np.array(np.broadcast_to(values, len(df)), dtype=np.float64)
+
+        # Samples are missing where an input is (comparisons would turn them into 0) and where the
+        # result is infinite, e.g. log10(0) or x / 0
+        missing = ~np.isfinite(values)
+        for array in namespace.values():
+            missing |= np.isnan(array)
+        values[missing] = np.nan
+        return values
+
+
+class _Expander(ast.NodeTransformer):
+    # Checks every node and replaces names of earlier derived curves by their expressions
+    def __init__(self, columns, curves):
+        self.columns = columns
+        self.curves = curves
+
+    def generic_visit(self, node):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f'{type(node).__name__} is not allowed')
+        return super().generic_visit(node)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in DERIVED_FUNCTIONS or node.keywords:
+            raise ValueError(f'unknown function {ast.unparse(node.func)}, use one of {", ".join(DERIVED_FUNCTIONS)}')
+        n_args = DERIVED_FUNCTIONS[node.func.id][1]
+        if len(node.args) != n_args:
+            raise ValueError(f'{node.func.id} takes {n_args} argument{"s" if n_args > 1 else ""}')
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+    def visit_Compare(self, node):
+        # 1 < GR < 60 would need `and`, which does not work on whole curves
+        if len(node.ops) > 1:
+            raise ValueError('chained comparisons are not allowed, combine them with &')
+        return self.generic_visit(node)
+
+    def visit_Constant(self, node):
+        # Numbers are floats: integer powers such as 9 ** 9 ** 9 would be computed exactly, for ever
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise ValueError(f'{node.value!r} is not a number')
+        return ast.Constant(float(node.value))
+
+    def visit_Name(self, node):
+        if node.id in self.curves:
+            return copy.deepcopy(self.curves[node.id].tree.body)
+        if node.id not in self.columns:
+            raise ValueError(f'unknown curve {node.id}')
+        return node
+
+
+def compile_derived_curve(name, expression, columns, curves=None):
+    # Raises ValueError naming the problem; curves are the derived curves defined before this one
+    curves = curves or {}
+    quoted = {}
+
+    def quote(match):
+        quoted[f'_quoted_{len(quoted)}'] = match.group(1)
+        return f'_quoted_{len(quoted) - 1}'
+
+    try:
+        tree = ast.parse(_QUOTED_NAME.sub(quote, expression).strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f'invalid expression ({e.msg})') from None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in quoted:
+            node.id = quoted[node.id]
+
+    tree = _Expander(set(columns), curves).visit(tree)
+    curve = DerivedCurve(name, expression, ast.fix_missing_locations(tree))
+
+    # A trial on one row catches what the checks above cannot, e.g. 9.0 ** 9 ** 9 overflowing
+    try:
+        curve.evaluate(pd.DataFrame({column: [1.0] for column in curve.inputs}, index=[0]))
+    except OverflowError:
+        raise ValueError('cannot be evaluated (a number is out of range)') from None
+    except (ArithmeticError, TypeError, ValueError) as e:
+        raise ValueError(f'cannot be evaluated ({e})') from None
+    return curve
+
+def parse_derived_curves(text, columns):
+    # One 'NAME = expression' per line; blank lines and lines starting with # are skipped.
+    # Returns the curves that compiled, by name, and one message per line that did not
+    curves, errors = {}, []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        name, sep, expression = line.partition('=')
+        name = name.strip().strip('`')
+        if not sep or not name or not expression.strip():
+            errors.append(f'{line}: expected NAME = expression')
+        elif name in columns or name in curves:
+            errors.append(f'{line}: {name} is already a curve')
+        else:
+            try:
+                curves[name] = compile_derived_curve(name, expression, columns, curves)
+            except ValueError as e:
+                errors.append(f'{line}: {e}')
+    return curves, errors
+
+
+def get_derived_values(dataset, curve):
+    # Evaluated on first use only, and memoized by (dataset hash, expanded expression) across
+    # reruns, sessions and renames; the cached array is shared, so it is made read-only
+    key = (dataset.key, curve.key)
+    values = _derived_cache.get(key)
+    if values is None:
+        # Whatever goes wrong is reported against this curve only, never as a crash of the page
+        try:
+            values = curve.evaluate(dataset.select(curve.inputs))
+        except Exception as e:
+            raise ValueError(f'cannot be evaluated ({e})') from e
+        values.flags.writeable = False
+        values = _derived_cache.put(key, values, values.nbytes)
+    return values
+
+def get_derived_stats(dataset, curve):
+    key = (dataset.key, curve.key, 'stats', curve.name)
+    stats = _derived_cache.get(key)
+    if stats is None:
+        df = pd.DataFrame({curve.name: get_derived_values(dataset, curve)})
+        stats = _derived_cache.put(key, CurveStats.from_frame(df), DERIVED_STATS_BYTES)
+    return stats
+
+def select_curves(dataset, columns, curves):
+    # The dataset's curves plus the derived ones, in the order asked for, and an error message per
+    # derived curve that failed to evaluate; those are left out of the frame
+    df = dataset.select([column for column in columns if column not in curves])
+    derived, errors = {}, {}
+    for column in columns:
+        if column in curves:
+            try:
+                derived[column] = get_derived_values(dataset, curves[column])
+            except ValueError as e:
+                errors[column] = str(e)
+    if not derived:
+        return df, errors
+    return df.assign(**derived)[[column for column in columns if column not in errors]], errors
+
+def select_curve_stats(dataset, columns, curves, df):
+    # Statistics of the selection: the dataset's ones, joined with those of the derived curves
+    stats = get_curve_stats(dataset, [column for column in columns if column not in curves])
+    for column in columns:
+        if column in curves:
+            stats = stats.join(get_derived_stats(dataset, curves[column]))
+    return stats.select(columns, df)
+
+def derived_data_key(data_key, curves):
+    # Identifies the dataset plus the definitions of its derived curves, for caches keyed by column
+    # name: redefining a curve under the same name must not hit the old entries
+    if not curves:
+        return data_key
+    definitions = repr(sorted((name, curve.key) for name, curve in curves.items()))
+    return f'{data_key}-{hashlib.blake2b(definitions.encode(), digest_size=8).hexdigest()}'
@@ -0,0 +1,171 @@
+# Import the required libraries
+import os
+import tempfile
+import time
+import weakref
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Rows formatted or encoded at a time: the exporters hold one chunk of text, never the whole file
+EXPORT_CHUNK_ROWS = 50_000
+
+LAS_NULL_VALUE = -999.25
+
+# Exports are written here and served by Streamlit's static file route (server.enableStaticServing),
+# which streams them from disk in small pieces. Streamlit serves the static folder next to the app
+# script, up to 200 MB per file
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'exports')
+EXPORT_URL_PATH = 'app/static/exports'
+EXPORT_STATIC_MAX_BYTES = 200 * 1024 ** 2
+
+# Exports left behind by a stopped server are removed after this many seconds
+EXPORT_MAX_AGE_SECONDS = 24 * 3600
+
+# Header items recomputed for the exported rows instead of copied from the source file
+LAS_COMPUTED_ITEMS = ('STRT', 'STOP', 'STEP', 'NULL')
+
+
+def _las_line(mnemonic, unit='', value='', descr=''):
+    return f' {mnemonic:<8}.{unit:<10} {value!s:<28}: {descr}\n'
+
+def _las_header(df, header):
+    # ~V, ~W, ~C and ~P sections for the exported curves; units, descriptions and well items come
+    # from the source header when there is one
+    header = header or {}
+    curves = {curve['mnemonic']: curve for curve in header.get('curves', [])}
+    info = header.get('info', {})
+
+    def items(section):
+        # Headers stored before units and descriptions were kept have values only
+        for mnemonic, value in header.get(section, {}).items():
+            item = info.get(section, {}).get(mnemonic, {})
+            yield mnemonic, item.get('unit', ''), value, item.get('descr', '')
+
+    depth = df.iloc[:, 0].to_numpy(dtype=np.float64)
+    index_curve = curves.get(str(df.columns[0]).split(':')[0], {})
+    unit = index_curve.get('unit', '')
+    steps = np.unique(np.round(np.diff(depth), 6)) if len(depth) > 1 else []
+    step = steps[0] if len(steps) == 1 else 0
+
+    lines = ['~Version Information\n', _las_line('VERS', value='2.0', descr='CWLS LOG ASCII STANDARD - VERSION 2.0'),
+             _las_line('WRAP', value='NO', descr='ONE LINE PER DEPTH STEP'), '~Well Information\n']
+    lines += [
+        _las_line('STRT', unit, f'{depth[0]:.4f}' if len(depth) else '', 'START DEPTH'),
+        _las_line('STOP', unit, f'{depth[-1]:.4f}' if len(depth) else '', 'STOP DEPTH'),
+        _las_line('STEP', unit, f'{step:.4f}', 'STEP'),
+        _las_line('NULL', value=LAS_NULL_VALUE, descr='NULL VALUE'),
+    ]
+    lines += [_las_line(mnemonic, unit, value, descr) for mnemonic, unit, value, descr in items('well')
+              if mnemonic not in LAS_COMPUTED_ITEMS]
+
+    lines.append('~Curve Information\n')
+    for column in df.columns:
+        curve = curves.get(str(column).split(':')[0], {})
+        lines.append(_las_line(column, curve.get('unit', ''), descr=curve.get('descr', '')))
+    if header.get('params'):
+        lines.append('~Parameter Information\n')
+        lines += [_las_line(mnemonic, unit, value, descr) for mnemonic, unit, value, descr in items('params')]
+    lines.append('~A  ' + ' '.join(str(column) for column in df.columns) + '\n')
+    return ''.join(lines)
+
+def iter_las(df, header=None):
+    # LAS 2.0, unwrapped; the first column is the index curve and nulls are written as LAS_NULL_VALUE
+    yield _las_header(df, header).encode('ascii', errors='replace')
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        yield chunk.to_csv(sep=' ', header=False, index=False, float_format='%.10g',
+                           na_rep=str(LAS_NULL_VALUE)).encode('ascii')
+
+def iter_csv(df, header=None):
+    yield df.iloc[:0].to_csv(index=False).encode('utf-8')
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(index=False, header=False).encode('utf-8')
+
+class _ChunkSink:
+    # Write-only file object collecting what the Parquet writer produces until it is taken
+    def __init__(self):
+        self.closed = False
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def iter_parquet(df, header=None):
+    # One row group per chunk, handed over as soon as it is encoded
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+            writer.write_table(pa.Table.from_pandas(df.iloc[start:start + EXPORT_CHUNK_ROWS], schema=schema,
+                                                    preserve_index=False))
+            yield sink.take()
+    yield sink.take()
+
+# Format name: (chunk generator, file extension, MIME type)
+EXPORT_FORMATS = {
+    'LAS 2.0': (iter_las, 'las', 'text/plain'),
+    'CSV': (iter_csv, 'csv', 'text/csv'),
+    'Parquet': (iter_parquet, 'parquet', 'application/octet-stream'),
+}
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _remove_stale_exports():
+    cutoff = time.time() - EXPORT_MAX_AGE_SECONDS
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                _remove(entry.path)
+        except OSError:
+            pass
+
+
+class ExportedFile:
+    # An export written chunk by chunk under EXPORT_DIR, never held in memory as a whole. The file
+    # is deleted when its holder (a session) drops it: a new export, or the session ended
+    def __init__(self, df, fmt, header=None):
+        iter_chunks, extension, _ = EXPORT_FORMATS[fmt]
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        _remove_stale_exports()
+        fd, self.path = tempfile.mkstemp(suffix=f'.{extension}', dir=EXPORT_DIR)
+        weakref.finalize(self, _remove, self.path)
+        with os.fdopen(fd, 'wb') as export:
+            for chunk in iter_chunks(df, header):
+                export.write(chunk)
+        self.nbytes = os.path.getsize(self.path)
+
+    @property
+    def url(self):
+        return f'{EXPORT_URL_PATH}/{os.path.basename(self.path)}'
+
+    @property
+    def servable(self):
+        # Whether the static file route can stream it
+        return self.nbytes <= EXPORT_STATIC_MAX_BYTES
+
+    def read(self):
+        with open(self.path, 'rb') as export:
+            return export.read()
@@ -0,0 +1,117 @@
+# Import the required libraries
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from las_cache import LruCache
+
+# Rows of the nullity matrix: about one per pixel row of the figure
+NULLITY_BINS = 1000
+NULLITY_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+_summary_cache = LruCache(NULLITY_CACHE_MAX_BYTES)
+
+
+class NullSummary:
+    # Compact nullity description of a DataFrame: null fraction per (row bin, column),
+    # null count per column and the depth ranges where each curve is null
+    def __init__(self, columns, n_rows, depth_range, fractions, counts, intervals):
+        self.columns = columns
+        self.n_rows = n_rows
+        self.depth_range = depth_range
+        self.fractions = fractions
+        self.counts = counts
+        self.intervals = intervals
+
+    @property
+    def nbytes(self):
+        return int(self.fractions.nbytes + self.intervals.memory_usage(index=True).sum())
+
+    def counts_table(self):
+        return pd.DataFrame({
+            'Nulls': self.counts,
+            'Non-null': self.n_rows - self.counts,
+            'Null %': np.round(100 * self.counts / max(self.n_rows, 1), 2),
+        }, index=self.columns)
+
+
+def _null_runs(mask):
+    # First and last row of every run of consecutive nulls
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+def _summarize(depth, columns, column_nulls, n_bins):
+    # One pass per column: null bitmap, binned to n_bins consecutive row ranges, plus null runs.
+    # column_nulls(column) returns the null mask of one curve, so only one is in memory at a time
+    n_rows = len(depth)
+    bin_size = max(1, -(-n_rows // n_bins))
+    bin_starts = np.arange(0, n_rows, bin_size)
+    bin_rows = np.diff(np.append(bin_starts, n_rows))
+
+    steps = np.diff(depth)
+    monotonic = bool(np.all(steps >= 0) or np.all(steps <= 0))
+    depth_range = (depth[0], depth[-1]) if n_rows and monotonic else None
+
+    fractions = np.zeros((len(bin_starts), len(columns)), dtype=np.float32)
+    counts = np.zeros(len(columns), dtype=np.int64)
+    intervals = []
+    for j, column in enumerate(columns):
+        mask = column_nulls(column)
+        counts[j] = mask.sum()
+        if not counts[j]:
+            continue
+        fractions[:, j] = np.add.reduceat(mask, bin_starts, dtype=np.int64) / bin_rows
+        starts, stops = _null_runs(mask)
+        intervals.append(pd.DataFrame({'Curve': column, 'Top': depth[starts], 'Base': depth[stops],
+                                       'Samples': stops - starts + 1}))
+
+    if intervals:
+        intervals = pd.concat(intervals, ignore_index=True)
+    else:
+        intervals = pd.DataFrame(columns=['Curve', 'Top', 'Base', 'Samples'])
+    return NullSummary(list(columns), n_rows, depth_range, fractions, counts, intervals)
+
+def null_summary(df, n_bins=NULLITY_BINS):
+    # The first column is the index curve (depth), as returned by read_las_file
+    return _summarize(df.iloc[:, 0].to_numpy(), list(df.columns),
+                      lambda column: df[column].isna().to_numpy(), n_bins)
+
+def get_null_summary(dataset, n_bins=NULLITY_BINS):
+    # Computed once per parsed file and shared by every rerun and session. Curves are read one at a
+    # time, so wells reopened from the store never load the whole frame
+    def build():
+        depth_column = dataset.columns[0]
+        depth = dataset.select([depth_column])[depth_column].to_numpy()
+        return _summarize(depth, list(dataset.columns),
+                          lambda column: dataset.select([column])[column].isna().to_numpy(), n_bins)
+
+    return _summary_cache.get_or_create((dataset.key, n_bins), build, lambda summary: summary.nbytes)
+
+def draw_nullity_matrix(summary, figsize=(25, 10)):
+    # Dark where the data is present, white where it is null, one image row per row bin
+    fig, ax = plt.subplots(figsize=figsize)
+    extent = None
+    if summary.depth_range is not None:
+        top, base = summary.depth_range
+        extent = (-0.5, len(summary.columns) - 0.5, base, top)
+    ax.imshow(1 - summary.fractions, aspect='auto', cmap='Greys', vmin=0, vmax=1,
+              interpolation='nearest', extent=extent)
+
+    ax.set_xticks(range(len(summary.columns)))
+    ax.set_xticklabels(summary.columns, rotation=45, ha='left', fontsize=14)
+    ax.xaxis.set_ticks_position('top')
+    ax.set_ylabel('Depth' if extent else 'Row', fontsize=14)
+    for x in np.arange(len(summary.columns) - 1) + 0.5:
+        ax.axvline(x, color='white', linewidth=1)
+    return fig
+
+def draw_nullity_bar(summary, figsize=(25, 10)):
+    # Share of non-null values per column, with the non-null count on top of each bar
+    fig, ax = plt.subplots(figsize=figsize)
+    present = summary.n_rows - summary.counts
+    bars = ax.bar(range(len(summary.columns)), present / max(summary.n_rows, 1), color='dimgray')
+    ax.bar_label(bars, labels=[str(count) for count in present], fontsize=12)
+    ax.set_xticks(range(len(summary.columns)))
+    ax.set_xticklabels(summary.columns, rotation=45, ha='right', fontsize=14)
+    ax.set_ylim(0, 1.05)
+    ax.set_ylabel('Non-null fraction', fontsize=14)
+    return fig
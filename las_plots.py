@@ -0,0 +1,111 @@
+# Import the required libraries
+import io
+import altair as alt
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from las_cache import LruCache
+from las_processing import get_depth_index
+from las_pyramid import PYRAMID_BASE_BIN, get_curve_pyramid
+
+# Budget for rendered PNG figures kept in memory, shared by every session of the server
+FIGURE_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Same options st.pyplot uses, so cached images look exactly like the ones it renders
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200, 'format': 'png'}
+
+_figure_cache = LruCache(FIGURE_CACHE_MAX_BYTES)
+
+# Min/max buckets per track sent to the browser by the interactive viewer: twice the pixel height
+# of the chart, so the first zoom steps still show full detail. A tile holds at most two points
+# per bucket, which keeps it below Altair's 5000-row limit
+INTERACTIVE_BUCKETS = 2000
+ALTAIR_MAX_ROWS = 5000
+TILE_CACHE_MAX_BYTES = 128 * 1024 ** 2
+
+_tile_cache = LruCache(TILE_CACHE_MAX_BYTES)
+
+
+def minmax_decimate(depth, values, n_buckets):
+    # Split the track into n_buckets runs of consecutive samples and keep only the minimum and
+    # maximum of each run, in their original order, so spikes survive at any zoom level
+    n = len(values)
+    if n <= 2 * n_buckets:
+        return depth, values
+
+    size = -(-n // n_buckets)
+    padded = np.full(size * n_buckets, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(n_buckets, size)
+
+    # NaNs never win; a bucket that is entirely null keeps a NaN so the line shows the gap
+    nulls = np.isnan(padded)
+    lowest = np.where(nulls, np.inf, padded).argmin(axis=1)
+    highest = np.where(nulls, -np.inf, padded).argmax(axis=1)
+
+    offsets = np.arange(n_buckets)[:, None] * size
+    index = (offsets + np.sort(np.stack([lowest, highest], axis=1), axis=1)).ravel()
+    index = index[index < n]
+    return depth[index], values[index]
+
+def curve_envelope(df, column, y_column, rows, n_pixels):
+    # (depth, values) to draw for rows of a curve at n_pixels rows of resolution. Long ranges are
+    # read from the curve's min/max pyramid, short ones (or unordered depth) are decimated directly
+    depth, values = df[y_column].to_numpy(), df[column].to_numpy()
+    if isinstance(rows, slice) and len(range(*rows.indices(len(df)))) >= PYRAMID_BASE_BIN * n_pixels:
+        envelope = get_curve_pyramid(df, column).envelope(depth, values, rows, n_pixels)
+        if envelope is not None:
+            return envelope
+    return minmax_decimate(depth[rows], values[rows], n_pixels)
+
+def get_figure_cache():
+    return _figure_cache
+
+def cached_figure_png(key, draw):
+    # draw() builds the Matplotlib figure and is only called when the key has not been rendered yet
+    def render():
+        fig = draw()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **SAVEFIG_OPTIONS)
+        plt.close(fig)
+        return buffer.getvalue()
+
+    return _figure_cache.get_or_create(key, render, len)
+
+def track_tiles(df, x_columns, y_column, ylim, key):
+    # Decimated (depth, value) points of every track inside ylim: one "tile" per depth window,
+    # rebuilt only when the window changes, while the browser handles zooming inside it
+    def build():
+        rows = get_depth_index(df, y_column).rows(*ylim)
+        tiles = []
+        for column in x_columns:
+            y, x = curve_envelope(df, column, y_column, rows, INTERACTIVE_BUCKETS)
+            # The pyramid level can hold up to twice as many bins as asked for: merge them down
+            y, x = minmax_decimate(y, x, INTERACTIVE_BUCKETS)
+            assert len(y) <= min(2 * INTERACTIVE_BUCKETS, ALTAIR_MAX_ROWS), 'tile above the point budget'
+            tiles.append(pd.DataFrame({'depth': y, 'value': x}))
+        return tiles
+
+    return _tile_cache.get_or_create(key, build,
+                                     lambda tiles: int(sum(tile.memory_usage(index=True).sum() for tile in tiles)))
+
+def interactive_well_logs(tiles, x_columns, log_scale_columns, xlims, ylim, color_palette='colorblind'):
+    # Vega-Lite version of plot_well_logs: tracks share the depth axis, and dragging or scrolling
+    # any of them pans/zooms all of them in the browser without a rerun
+    colors = sns.color_palette(color_palette, n_colors=len(x_columns)).as_hex()
+    charts = []
+    for i, (column, tile) in enumerate(zip(x_columns, tiles)):
+        x_scale = alt.Scale(type='log' if column in log_scale_columns else 'linear', zero=False,
+                            domain=list(xlims[column]) if column in xlims else alt.Undefined)
+        zoom = alt.selection_interval(bind='scales', encodings=['y'], name=f'zoom_{i}')
+        chart = alt.Chart(tile).mark_line(color=colors[i], strokeWidth=0.8, clip=True).encode(
+            x=alt.X('value:Q', title=column, scale=x_scale, axis=alt.Axis(orient='top')),
+            y=alt.Y('depth:Q', title='Depth' if i == 0 else None,
+                    scale=alt.Scale(domain=[min(ylim), max(ylim)], reverse=True, zero=False),
+                    axis=alt.Axis(labels=i == 0)),
+            order='depth:Q',
+        ).properties(width=120, height=700).add_params(zoom)
+        charts.append(chart)
+
+    return alt.hconcat(*charts, spacing=5).resolve_scale(y='shared')
@@ -0,0 +1,282 @@
+# Import the required libraries
+import warnings
+import numpy as np
+import pandas as pd
+from las_cache import LruCache, frame_hash
+
+# Imputation statistics are a few bytes each, so the budget effectively caps the number of entries
+IMPUTATION_CACHE_MAX_BYTES = 1024 ** 2
+IMPUTATION_ENTRY_BYTES = 64
+
+_fill_cache = LruCache(IMPUTATION_CACHE_MAX_BYTES)
+
+# Depth indexes hold a float64 copy of the depth curve at most
+INDEX_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+_index_cache = LruCache(INDEX_CACHE_MAX_BYTES)
+
+# Quartiles reported by CurveStats.describe(), as in DataFrame.describe()
+STAT_QUANTILES = [0.25, 0.5, 0.75]
+
+# Boxplot statistics keep at most BOX_MAX_FLIERS fliers per curve: more points than pixel rows
+# add nothing to the picture. Approximate quartiles are estimated from BOX_SAMPLE_ROWS rows
+BOX_MAX_FLIERS = 2000
+BOX_SAMPLE_ROWS = 200_000
+BOX_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+_box_cache = LruCache(BOX_CACHE_MAX_BYTES)
+
+
+def fill_values(df, methods, specific_values=None, data_key=None):
+    # Fill value per column for methods 'Mean', 'Median', 'Specific Value' or 'Zero'.
+    # Values are memoized by (data, column, method, value), so changing the method of one curve
+    # only computes that curve; data_key identifies df cheaply when it comes straight from a dataset
+    specific_values = specific_values or {}
+    fills = {}
+    pending = {}
+    for column, method in methods.items():
+        key = (data_key or frame_hash(df, [column]), column, method, specific_values.get(column))
+        value = _fill_cache.get(key)
+        if value is None:
+            pending.setdefault(method, []).append((column, key))
+        else:
+            fills[column] = value
+
+    # Columns sharing a method get their statistics in a single vectorized call
+    for method, entries in pending.items():
+        columns = [column for column, _ in entries]
+        if method == 'Mean':
+            stats = df[columns].mean()
+        elif method == 'Median':
+            stats = df[columns].median()
+        elif method == 'Zero':
+            stats = pd.Series(0.0, index=columns)
+        else:
+            stats = pd.Series([specific_values[column] for column in columns], index=columns)
+        for column, key in entries:
+            fills[column] = _fill_cache.put(key, stats[column], IMPUTATION_ENTRY_BYTES)
+    return fills
+
+
+class CurveStats:
+    # Per-curve summary statistics (count, mean, sum of squared deviations, min, max, quartiles)
+    # plus the depth step, computed in one vectorized pass. Statistics of a filtered selection are
+    # derived from the dataset's ones instead of rescanning every row
+    def __init__(self, n_rows, count, mean, m2, minimum, maximum, step=None, quantiles=None, df=None):
+        self.n_rows = n_rows
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+        self.step = step
+        self._quantiles = quantiles
+        self._df = df
+
+    @classmethod
+    def from_frame(cls, df, quantiles=True):
+        numeric = df.select_dtypes('number')
+        values = numeric.to_numpy(dtype=np.float64)
+        index = numeric.columns
+
+        count = (~np.isnan(values)).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(values, axis=0) / count
+        m2 = np.nansum((values - mean) ** 2, axis=0)
+        minimum = np.fmin.reduce(values, axis=0) if len(values) else np.full(len(index), np.nan)
+        maximum = np.fmax.reduce(values, axis=0) if len(values) else np.full(len(index), np.nan)
+
+        step = None
+        if len(df) > 1 and len(df.columns) and df.columns[0] in index:
+            step = float(np.nanmedian(np.diff(df.iloc[:, 0].to_numpy())))
+
+        return cls(len(df), pd.Series(count, index=index), pd.Series(mean, index=index),
+                   pd.Series(m2, index=index), pd.Series(minimum, index=index), pd.Series(maximum, index=index),
+                   step, numeric.quantile(STAT_QUANTILES) if quantiles else None, df)
+
+    @property
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2 / (self.count - 1))
+
+    @property
+    def quantiles(self):
+        # Quartiles cannot be updated incrementally, so derived statistics compute them on first use
+        if self._quantiles is None:
+            self._quantiles = self._df[self.count.index].quantile(STAT_QUANTILES)
+        return self._quantiles
+
+    def range(self, column):
+        return self.min[column], self.max[column]
+
+    def describe(self):
+        # Same layout as DataFrame.describe()
+        quantiles = self.quantiles.copy()
+        quantiles.index = [f'{q:.0%}' for q in STAT_QUANTILES]
+        return pd.concat([
+            pd.DataFrame({'count': self.count.astype(np.float64), 'mean': self.mean, 'std': self.std,
+                          'min': self.min}).T,
+            quantiles,
+            self.max.to_frame('max').T,
+        ])
+
+    def select(self, columns, df=None):
+        columns = [column for column in columns if column in self.count.index]
+        quantiles = None if self._quantiles is None else self._quantiles[columns]
+        return CurveStats(self.n_rows, self.count[columns], self.mean[columns], self.m2[columns],
+                          self.min[columns], self.max[columns], self.step, quantiles,
+                          self._df if df is None else df)
+
+    def join(self, other, df=None):
+        # Statistics of more curves over the same rows, e.g. derived curves summarized on their own
+        quantiles = None
+        if self._quantiles is not None and other._quantiles is not None:
+            quantiles = pd.concat([self._quantiles, other._quantiles], axis=1)
+        return CurveStats(self.n_rows, pd.concat([self.count, other.count]), pd.concat([self.mean, other.mean]),
+                          pd.concat([self.m2, other.m2]), pd.concat([self.min, other.min]),
+                          pd.concat([self.max, other.max]), self.step, quantiles, self._df if df is None else df)
+
+    def drop_rows(self, dropped, remaining):
+        # Subtract the statistics of the dropped rows (parallel variance formula run backwards);
+        # min/max are only rescanned for curves whose extreme value was in a dropped row
+        removed = CurveStats.from_frame(dropped[self.count.index], quantiles=False)
+        count = self.count - removed.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (self.count * self.mean - removed.count * removed.mean.fillna(0)) / count
+        delta = (removed.mean - mean).fillna(0)
+        m2 = (self.m2 - removed.m2 - delta ** 2 * removed.count * count / self.count).clip(lower=0)
+
+        minimum, maximum = self.min.copy(), self.max.copy()
+        for column in self.count.index[(removed.min <= self.min) | (removed.max >= self.max)]:
+            minimum[column], maximum[column] = remaining[column].min(), remaining[column].max()
+
+        return CurveStats(len(remaining), count, mean, m2, minimum, maximum, self.step, None, remaining)
+
+    def fill(self, values, filled):
+        # Add the imputed values: k copies of v shift mean and m2 by the parallel variance formula
+        count, mean, m2 = self.count.copy(), self.mean.copy(), self.m2.copy()
+        minimum, maximum = self.min.copy(), self.max.copy()
+        for column, value in values.items():
+            if column not in count.index or pd.isna(value):
+                continue
+            added = self.n_rows - count[column]
+            if not added:
+                continue
+            total = count[column] + added
+            if count[column]:
+                delta = value - mean[column]
+                m2[column] += delta ** 2 * count[column] * added / total
+                mean[column] += delta * added / total
+            else:
+                mean[column], m2[column] = value, 0.0
+            count[column] = total
+            minimum[column] = np.fmin(minimum[column], value)
+            maximum[column] = np.fmax(maximum[column], value)
+
+        return CurveStats(self.n_rows, count, mean, m2, minimum, maximum, self.step, None, filled)
+
+
+def _column_stats(dataset, column):
+    # Statistics of one curve; the quartiles are computed, so the curve itself is not kept
+    stats = CurveStats.from_frame(dataset.select([column]))
+    stats._df = None
+    return stats
+
+def get_curve_stats(dataset, columns=None):
+    # Statistics of the asked-for curves (all by default). Each curve is summarized the first time
+    # it is asked for and kept with the dataset, so every view and rerun reuses it; wells reopened
+    # from the store only read that one curve, never the whole frame
+    columns = [column for column in (dataset.columns if columns is None else columns) if column in dataset.columns]
+    parts = [dataset.derived(('stats', column), lambda column=column: _column_stats(dataset, column))
+             for column in columns]
+    if not parts:
+        return CurveStats.from_frame(dataset.select([]))
+
+    stats = parts[0].select(list(parts[0].count.index))
+    for part in parts[1:]:
+        stats = stats.join(part)
+    depth_column = dataset.columns[0]
+    stats.step = parts[columns.index(depth_column)].step if depth_column in columns else None
+    return stats
+
+
+class DepthIndex:
+    # Sorted depth curve for O(log n) depth-window lookups. Monotonic depth (increasing or
+    # decreasing, any spacing) maps a window to a contiguous row slice, i.e. a view of the data
+    def __init__(self, depth):
+        depth = np.asarray(depth, dtype=np.float64)
+        self.n_rows = len(depth)
+        steps = np.diff(depth)
+        self.decreasing = False
+        self.order = None
+        if np.all(steps >= 0):
+            self.sorted = depth
+        elif np.all(steps <= 0):
+            self.sorted = depth[::-1]
+            self.decreasing = True
+        else:
+            # Unordered depth (e.g. merged runs): fall back to a sort permutation, NaNs last
+            self.order = np.argsort(depth, kind='stable')
+            self.sorted = depth[self.order]
+
+    def rows(self, top, base):
+        # Rows with top <= depth <= base (either order), as a slice when possible
+        low, high = min(top, base), max(top, base)
+        start = np.searchsorted(self.sorted, low, side='left')
+        stop = np.searchsorted(self.sorted, high, side='right')
+        if self.order is not None:
+            return np.sort(self.order[start:stop])
+        if self.decreasing:
+            return slice(self.n_rows - stop, self.n_rows - start)
+        return slice(start, stop)
+
+    def window(self, df, top, base):
+        return df.iloc[self.rows(top, base)]
+
+
+def get_depth_index(df, depth_column):
+    # Keyed by the content of the depth curve, so filtered frames with the same rows share it
+    key = ('depth_index', frame_hash(df, [depth_column]))
+    return _index_cache.get_or_create(key, lambda: DepthIndex(df[depth_column].to_numpy()),
+                                      lambda index: index.sorted.nbytes * (2 if index.order is not None else 1))
+
+
+def box_stats(df, whis=1.5, max_fliers=BOX_MAX_FLIERS, approximate=False):
+    # Boxplot statistics of every column in one vectorized pass, in the format of Axes.bxp:
+    # quartiles, whiskers at the most extreme samples within whis * IQR of the box (as
+    # Axes.boxplot does) and the fliers beyond them. NaNs are ignored
+    values = df.to_numpy(dtype=np.float64)
+    sample = values
+    if approximate and len(values) > BOX_SAMPLE_ROWS:
+        rows = np.random.default_rng(0).choice(len(values), BOX_SAMPLE_ROWS, replace=False)
+        sample = values[rows]
+    if not len(values):
+        # No rows left (e.g. after deleting null rows): empty boxes, as for all-null curves
+        return {column: {'q1': np.nan, 'med': np.nan, 'q3': np.nan, 'whislo': np.nan, 'whishi': np.nan,
+                         'fliers': np.empty(0), 'n_fliers': 0} for column in df.columns}
+
+    with warnings.catch_warnings():
+        # All-null curves give NaN statistics, i.e. an empty box
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q1, med, q3 = np.nanquantile(sample, [0.25, 0.5, 0.75], axis=0)
+        low, high = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+        whislo = np.fmin.reduce(np.where(values >= low, values, np.nan), axis=0)
+        whishi = np.fmax.reduce(np.where(values <= high, values, np.nan), axis=0)
+    outside = (values < whislo) | (values > whishi)
+
+    stats = {}
+    for j, column in enumerate(df.columns):
+        fliers = values[outside[:, j], j]
+        n_fliers = len(fliers)
+        if n_fliers > max_fliers:
+            # Evenly spaced sorted fliers keep the extremes and the shape of the tails
+            fliers = np.sort(fliers)[np.linspace(0, n_fliers - 1, max_fliers).round().astype(np.int64)]
+        stats[column] = {'q1': q1[j], 'med': med[j], 'q3': q3[j], 'whislo': whislo[j], 'whishi': whishi[j],
+                         'fliers': fliers, 'n_fliers': n_fliers}
+    return stats
+
+def get_box_stats(df, data_key=None, approximate=False):
+    # Cached apart from the figure, so restyling a boxplot (log axes) does not recompute it
+    key = ('box_stats', data_key or frame_hash(df), tuple(df.columns), approximate)
+    return _box_cache.get_or_create(key, lambda: box_stats(df, approximate=approximate),
+                                    lambda stats: sum(box['fliers'].nbytes + 64 for box in stats.values()))
@@ -0,0 +1,94 @@
+# Import the required libraries
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+# Every profiled rerun is also appended to this JSON lines file when the variable is set, so
+# timings can be collected across releases and files
+PROFILE_LOG_PATH = os.environ.get('LAS_PROFILE_LOG')
+
+# Records kept per session for the export
+PROFILE_HISTORY_MAX_RECORDS = 5000
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+# tracemalloc's peak is process-wide: the traced stages of the sessions measuring memory run one at a
+# time so that no session resets the peak of another
+_stage_lock = threading.Lock()
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+class MemoryTracing:
+    # tracemalloc is process-wide and slows allocations down, so it only runs while some session
+    # holds one of these; the last one to be released (or garbage collected) stops it
+    def __init__(self):
+        global _tracing_users
+        with _tracing_lock:
+            _tracing_users += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        weakref.finalize(self, _stop_tracing)
+
+
+class RerunProfile:
+    # Wall time of each stage of one script run, and its peak traced memory when traced is set (the
+    # session shows the performance panel). Stages are timed one after the other: nesting them would
+    # reset the outer stage's peak. Traced stages hold _stage_lock, which serializes them across the
+    # sessions measuring memory only; other sessions never wait on it. The peak still includes what
+    # other threads (background parses, untraced sessions) allocate meanwhile
+    def __init__(self, traced=False):
+        self.traced = traced
+        self.started = time.perf_counter()
+        self.timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        self.context = {}
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, traced=True):
+        # traced=False for stages that only wait, which would hold the lock for nothing
+        tracing = self.traced and traced and tracemalloc.is_tracing()
+        if tracing:
+            _stage_lock.acquire()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {'stage': name, 'seconds': time.perf_counter() - start, 'peak_mb': None}
+            if tracing:
+                if tracemalloc.is_tracing():
+                    record['peak_mb'] = (tracemalloc.get_traced_memory()[1] - base) / 1024 ** 2
+                _stage_lock.release()
+            self.records.append(record)
+
+    def finish(self):
+        # Records of the run, each tagged with the time of the run and the context (well, size)
+        total = {'stage': 'total', 'seconds': time.perf_counter() - self.started, 'peak_mb': None}
+        return [{'time': self.timestamp, **self.context, **record} for record in self.records + [total]]
+
+
+def append_profile_log(records, path=PROFILE_LOG_PATH):
+    if not path:
+        return
+    try:
+        with open(path, 'a', encoding='utf-8') as log:
+            for record in records:
+                log.write(json.dumps(record, default=str) + '\n')
+    except OSError:
+        pass
+
+def records_to_jsonl(records):
+    return ''.join(json.dumps(record, default=str) + '\n' for record in records)
@@ -0,0 +1,88 @@
+# Import the required libraries
+import numpy as np
+from las_cache import LruCache, frame_hash
+
+# Samples per bin at the finest level; each coarser level merges pairs of bins. With min and max
+# kept per bin the whole pyramid costs a quarter of the curve itself
+PYRAMID_BASE_BIN = 16
+PYRAMID_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+_pyramid_cache = LruCache(PYRAMID_CACHE_MAX_BYTES)
+
+
+def _pairwise(minimum, maximum):
+    # Merge consecutive pairs of bins; an odd last bin is merged with an empty (NaN) one
+    if len(minimum) % 2:
+        minimum, maximum = np.append(minimum, np.nan), np.append(maximum, np.nan)
+    return np.fmin(minimum[0::2], minimum[1::2]), np.fmax(maximum[0::2], maximum[1::2])
+
+class CurvePyramid:
+    # Min/max of a curve over bins of PYRAMID_BASE_BIN * 2**k consecutive samples, for every level k
+    # down to a single bin. NaNs are ignored; a bin that is entirely null stays NaN
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.n_rows = len(values)
+        size = PYRAMID_BASE_BIN
+        n_bins = max(1, -(-self.n_rows // size))
+        padded = np.full(n_bins * size, np.nan)
+        padded[:self.n_rows] = values
+        padded = padded.reshape(n_bins, size)
+
+        with np.errstate(invalid='ignore'):
+            minimum, maximum = np.fmin.reduce(padded, axis=1), np.fmax.reduce(padded, axis=1)
+        self.levels = [(size, minimum, maximum)]
+        while len(minimum) > 1:
+            size *= 2
+            minimum, maximum = _pairwise(minimum, maximum)
+            self.levels.append((size, minimum, maximum))
+
+    @property
+    def nbytes(self):
+        return sum(minimum.nbytes + maximum.nbytes for _, minimum, maximum in self.levels)
+
+    def level_for(self, n_rows, n_pixels):
+        # Coarsest level that still has at least one bin per pixel row, or None when even the
+        # finest level is too coarse and the raw samples should be drawn
+        chosen = None
+        for level in self.levels:
+            if level[0] * n_pixels > n_rows:
+                break
+            chosen = level
+        return chosen
+
+    def envelope(self, depth, values, rows, n_pixels):
+        # (depth, values) tracing the min/max envelope of rows (a slice of the curve) with about
+        # n_pixels bins: the minimum at the bin's first sample, the maximum at its last one.
+        # Returns None when the pyramid cannot serve the request
+        if not isinstance(rows, slice):
+            return None
+        start, stop, _ = rows.indices(self.n_rows)
+        level = self.level_for(stop - start, n_pixels)
+        if level is None:
+            return None
+
+        size, minimum, maximum = level
+        bins = np.arange(start // size, -(-stop // size))
+        first = np.clip(bins * size, start, stop - 1)
+        last = np.clip((bins + 1) * size, start + 1, stop) - 1
+        minimum, maximum = minimum[bins], maximum[bins]
+
+        # Bins cut by the window edges are recomputed from their samples inside the window
+        with np.errstate(invalid='ignore'):
+            for i in {0, len(bins) - 1}:
+                part = values[first[i]:last[i] + 1]
+                minimum[i], maximum[i] = np.fmin.reduce(part), np.fmax.reduce(part)
+
+        index = np.stack([first, last], axis=1).ravel()
+        return depth[index], np.stack([minimum, maximum], axis=1).ravel()
+
+
+def get_curve_pyramid(df, column):
+    # Keyed by the content of the curve: built on the first plot of a curve and reused by every
+    # later zoom, window and session, including selections where imputation left the curve unchanged
+    key = ('pyramid', frame_hash(df, [column]))
+    return _pyramid_cache.get_or_create(key, lambda: CurvePyramid(df[column].to_numpy()),
+                                        lambda pyramid: pyramid.nbytes)
+
+def get_pyramid_cache():
+    return _pyramid_cache
@@ -0,0 +1,453 @@
+# Import the required libraries
+import hashlib
+import io
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import lasio as ls
+import numpy as np
+import pandas as pd
+from las_cache import LruCache
+from las_store import open_dataset, table_to_df, write_dataset
+
+# Budget for parsed DataFrames kept in memory, shared by every session of the server
+PARSE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Size of the pieces of the ~A section tokenized at a time by the streaming reader
+CHUNK_BYTES = 1024 ** 2
+
+# Rows handed back per block by the C tokenizer used for unwrapped files
+FAST_PATH_CHUNK_ROWS = 100_000
+
+# Suffix of the cache/store key of a well loaded in compact mode
+COMPACT_KEY_SUFFIX = '-compact'
+
+# Uploads parsed at the same time in background threads; the tokenizers run in C and release the GIL
+PARSE_WORKERS = 2
+
+
+class LasDataset:
+    # Parsed LAS file: the curve DataFrame plus the header sections, identified by the content hash.
+    # Datasets reopened from the on-disk store keep the memory-mapped Arrow table and only copy
+    # curves out of it when they are asked for
+    def __init__(self, key, df, header, table=None):
+        self.key = key
+        self.header = header
+        self.table = table
+        self._df = df
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = table_to_df(self.table)
+        return self._df
+
+    @property
+    def columns(self):
+        if self._df is None:
+            return pd.Index(self.table.column_names)
+        return self._df.columns
+
+    @property
+    def n_rows(self):
+        if self._df is None:
+            return self.table.num_rows
+        return len(self._df)
+
+    @property
+    def nbytes(self):
+        if self._df is None:
+            return int(self.table.nbytes)
+        return int(self._df.memory_usage(index=True).sum())
+
+    @property
+    def compact_saved_bytes(self):
+        # Memory saved against parsing every curve as float64 (the default mode)
+        return self.n_rows * len(self.columns) * 8 - self.nbytes
+
+    def derived(self, name, build):
+        # Values computed from the curves (statistics, pyramids...) live as long as the dataset
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build()
+            return self._derived[name]
+
+    def select(self, columns):
+        if self._df is None:
+            return table_to_df(self.table, columns)
+        return self._df[columns]
+
+    def head(self, n=5):
+        if self._df is None:
+            return table_to_df(self.table.slice(0, n))
+        return self._df.head(n)
+
+    def tail(self, n=5):
+        if self._df is None:
+            start = max(self.table.num_rows - n, 0)
+            df = table_to_df(self.table.slice(start))
+            df.index += start
+            return df
+        return self._df.tail(n)
+
+
+class DatasetLease:
+    # A session's claim on a cached dataset: while any lease on a well is alive the parse cache
+    # does not evict it, so sessions showing it never reparse it into private copies. The lease
+    # is released when it is garbage collected (the session moved to another well or ended)
+    def __init__(self, dataset):
+        self.key = dataset.key
+        self.dataset = dataset
+        # Not pinned when the pinned wells already fill the cache budget: the well may then be
+        # evicted, and this session keeps its own reference to it
+        self.pinned = get_parse_cache().pin(self.key)
+        if self.pinned:
+            weakref.finalize(self, get_parse_cache().unpin, self.key)
+
+
+def las_content_hash(u_file):
+    # Hash the upload in place, without materializing another copy of the bytes
+    with u_file.getbuffer() as buffer:
+        return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+def las_header(las):
+    # The ~V, ~W and ~P sections map mnemonics to values; 'info' keeps their units and descriptions
+    sections = {'version': las.version, 'well': las.well, 'params': las.params}
+    header = {name: {item.mnemonic: item.value for item in items} for name, items in sections.items()}
+    header['curves'] = [{'mnemonic': curve.mnemonic, 'unit': curve.unit, 'descr': curve.descr}
+                        for curve in las.curves]
+    header['info'] = {name: {item.mnemonic: {'unit': item.unit, 'descr': item.descr} for item in items}
+                      for name, items in sections.items()}
+    return header
+
+def parse_las_lasio(las_file_contents):
+    las_file_contents_str = las_file_contents.decode("utf-8")
+    las_file_buffer = io.StringIO(las_file_contents_str)
+    las = ls.read(las_file_buffer)
+    # Built straight from the curves: las.df() followed by reset_index copies the data twice
+    df = pd.DataFrame({curve.mnemonic: curve.data for curve in las.curves})
+    df.index = pd.RangeIndex(1, len(df) + 1)
+    return df, las_header(las)
+
+def _header_value(value):
+    # Same convention as lasio: numbers become floats, but identifiers with leading zeros stay text
+    if len(value) > 1 and value[0] == '0' and value[1].isdigit():
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def _parse_header_line(line):
+    # MNEM.UNIT  VALUE : DESCRIPTION
+    mnemonic, _, rest = line.partition('.')
+    unit = ''
+    if rest and not rest[0].isspace():
+        unit, _, rest = rest.replace('\t', ' ').partition(' ')
+    value, _, descr = rest.rpartition(':') if ':' in rest else (rest, '', '')
+    return mnemonic.strip(), unit.strip(), value.strip(), descr.strip()
+
+def _curve_mnemonics(curves):
+    # Duplicated mnemonics are numbered the way lasio does it (GR:1, GR:2)
+    names = [curve['mnemonic'] for curve in curves]
+    seen = {}
+    for i, name in enumerate(names):
+        if names.count(name) > 1:
+            seen[name] = seen.get(name, 0) + 1
+            names[i] = f'{name}:{seen[name]}'
+    return names
+
+def read_las_header(stream):
+    # Scan the header sections line by line, leaving the stream positioned at the start of ~A
+    header = {'version': {}, 'well': {}, 'curves': [], 'params': {},
+              'info': {'version': {}, 'well': {}, 'params': {}}}
+    section = None
+    for raw_line in iter(stream.readline, b''):
+        line = raw_line.decode('utf-8').strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('~'):
+            section = line[1:2].upper()
+            if section == 'A':
+                return header
+            continue
+        if section not in ('V', 'W', 'C', 'P'):
+            continue
+
+        mnemonic, unit, value, descr = _parse_header_line(line)
+        if section == 'C':
+            header['curves'].append({'mnemonic': mnemonic, 'unit': unit, 'descr': descr})
+        else:
+            name = {'V': 'version', 'W': 'well', 'P': 'params'}[section]
+            header[name][mnemonic] = _header_value(value)
+            header['info'][name][mnemonic] = {'unit': unit, 'descr': descr}
+
+    raise ValueError('LAS file has no ~A section')
+
+def _data_chunks(stream):
+    # Yield pieces of the stream that always end on a whitespace boundary
+    remainder = b''
+    while True:
+        chunk = stream.read(CHUNK_BYTES)
+        if not chunk:
+            if remainder.strip():
+                yield remainder
+            return
+        chunk = remainder + chunk
+        cut = max(chunk.rfind(b'\n'), chunk.rfind(b' ')) + 1
+        if cut == 0:
+            remainder = chunk
+            continue
+        remainder = chunk[cut:]
+        yield chunk[:cut]
+
+def _count_lines(stream):
+    start = stream.tell()
+    lines = 1
+    for chunk in iter(lambda: stream.read(CHUNK_BYTES), b''):
+        lines += chunk.count(b'\n')
+    stream.seek(start)
+    return lines
+
+def _token_blocks(stream, n_curves):
+    # Wrapped data: rows span several lines, so treat ~A as one stream of values
+    pending = np.empty(0, dtype=np.float64)
+    for chunk in _data_chunks(stream):
+        # Raises ValueError on non-numeric tokens, which sends the file to the lasio fallback
+        tokens = np.array(chunk.split(), dtype=np.float64)
+        if pending.size:
+            tokens = np.concatenate([pending, tokens])
+        n_rows = tokens.size // n_curves
+        pending = tokens[n_rows * n_curves:]
+        yield tokens[:n_rows * n_curves].reshape(n_rows, n_curves)
+
+    if pending.size:
+        raise ValueError('Number of values in ~A is not a multiple of the number of curves')
+
+def _csv_blocks(stream, n_curves):
+    # Unwrapped data: one row per line, so pandas' C tokenizer can hand back whole
+    # (depth, curve) blocks; rows with missing, extra or non-numeric values raise ValueError
+    reader = pd.read_csv(stream, sep=r'\s+', header=None, names=range(n_curves), dtype=np.float64,
+                         na_filter=False, engine='c', chunksize=FAST_PATH_CHUNK_ROWS)
+    with reader:
+        for chunk in reader:
+            yield chunk.to_numpy()
+
+def read_las_stream(stream, progress=None):
+    # Parse a LAS 2.0 file chunk by chunk into a preallocated array, one contiguous column per curve.
+    # progress(done, total) is called with the bytes of ~A consumed after every block
+    header = read_las_header(stream)
+    version = header['version']
+    if version.get('VERS', 2.0) not in (1.2, 2.0):
+        raise ValueError(f"Unsupported LAS version: {version.get('VERS')}")
+    n_curves = len(header['curves'])
+    if n_curves == 0:
+        raise ValueError('LAS file has no curves')
+    null_value = header['well'].get('NULL')
+
+    # Unwrapped files have one row per line, so the line count bounds the number of rows;
+    # wrapped rows span several lines, so start smaller and grow the array if needed
+    wrapped = str(version.get('WRAP', 'NO')).upper() == 'YES'
+    capacity = _count_lines(stream)
+    if wrapped:
+        capacity = capacity // 2 + 1
+    values = np.empty((capacity, n_curves), dtype=np.float64, order='F')
+
+    data_start = stream.tell()
+    data_bytes = stream.seek(0, io.SEEK_END) - data_start
+    stream.seek(data_start)
+    blocks = _token_blocks(stream, n_curves) if wrapped else _csv_blocks(stream, n_curves)
+
+    rows = 0
+    for block in blocks:
+        if rows + len(block) > capacity:
+            capacity = max(rows + len(block), int(capacity * 1.5))
+            grown = np.empty((capacity, n_curves), dtype=np.float64, order='F')
+            grown[:rows] = values[:rows]
+            values = grown
+
+        # NULL values are replaced in the destination: blocks from pandas are read-only views
+        target = values[rows:rows + len(block)]
+        target[:] = block
+        if null_value is not None:
+            target[target == null_value] = np.nan
+        rows += len(block)
+        if progress is not None:
+            progress(stream.tell() - data_start, data_bytes)
+
+    if rows < capacity:
+        values = values[:rows]
+    df = pd.DataFrame(values, columns=_curve_mnemonics(header['curves']), copy=False)
+    df.index = pd.RangeIndex(1, rows + 1)
+    return df, header
+
+def compact_frame(df):
+    # Depth (the first curve) stays float64 so depth windows and steps stay exact. Complete curves
+    # holding only small integers (flags, zone or facies codes) become int8/int16 and every other
+    # float curve float32, which keeps ~7 significant digits, more than logging tools deliver
+    dtypes = {}
+    for column in df.columns[1:]:
+        values = df[column].to_numpy()
+        if values.dtype != np.float64:
+            continue
+        dtypes[column] = np.float32
+        if len(values) and not np.isnan(values).any() and np.array_equal(values, np.round(values)):
+            for dtype in (np.int8, np.int16):
+                if np.iinfo(dtype).min <= values.min() and values.max() <= np.iinfo(dtype).max:
+                    dtypes[column] = dtype
+                    break
+    return df.astype(dtypes, copy=False)
+
+def parse_las(u_file, progress=None):
+    # Files the streaming reader cannot handle (LAS 3.0, text curves, ragged rows) go through lasio,
+    # which reports no progress
+    u_file.seek(0)
+    try:
+        return read_las_stream(u_file, progress)
+    except (ValueError, UnicodeDecodeError):
+        return parse_las_lasio(u_file.getvalue())
+    finally:
+        u_file.seek(0)
+
+# Imported modules survive Streamlit reruns, so this cache is shared by all sessions of the process
+_parse_cache = LruCache(PARSE_CACHE_MAX_BYTES)
+
+def get_parse_cache():
+    return _parse_cache
+
+def open_or_parse(key, u_file, compact=False, progress=None):
+    # Wells seen before (by this or an earlier server process) are memory-mapped from the store
+    stored = open_dataset(key)
+    if stored is not None:
+        table, header = stored
+        return LasDataset(key, None, header, table)
+
+    df, header = parse_las(u_file, progress)
+    if compact:
+        df = compact_frame(df)
+    write_dataset(key, df, header)
+    return LasDataset(key, df, header)
+
+def las_dataset_key(u_file, compact=False):
+    # Compact and full-precision copies of a well are cached and stored under different keys
+    key = las_content_hash(u_file)
+    return key + COMPACT_KEY_SUFFIX if compact else key
+
+def load_las_dataset(u_file, compact=False):
+    # Reruns and other sessions uploading the same bytes reuse the parsed dataset
+    key = las_dataset_key(u_file, compact)
+    return get_parse_cache().get_or_create(key, lambda: open_or_parse(key, u_file, compact),
+                                           lambda dataset: dataset.nbytes)
+
+def load_stored_dataset(key):
+    # Dataset already parsed elsewhere (e.g. by a batch worker); None if it is neither cached nor stored
+    dataset = get_parse_cache().get(key)
+    if dataset is None:
+        stored = open_dataset(key)
+        if stored is None:
+            return None
+        table, header = stored
+        dataset = LasDataset(key, None, header, table)
+        get_parse_cache().put(key, dataset, dataset.nbytes)
+    return dataset
+
+
+class ParseCancelled(Exception):
+    pass
+
+class ParseJob:
+    # Background parse of one upload, shared by every session waiting for the same bytes. The
+    # header is read up front so it can be shown while the curves are parsed. Sessions hold the job
+    # through ParseTicket; when the last holder lets go of an unfinished job it is cancelled
+    def __init__(self, key, u_file=None, compact=False, dataset=None):
+        self.key = key
+        self.done_bytes = 0
+        self.total_bytes = 0
+        self._holders = 0
+        self._cancelled = threading.Event()
+        if dataset is not None:
+            self.header = dataset.header
+            self.future = Future()
+            self.future.set_result(dataset)
+            return
+
+        try:
+            self.header = read_las_header(u_file)
+        except (ValueError, UnicodeDecodeError):
+            self.header = None
+        finally:
+            u_file.seek(0)
+        self.future = _parse_pool.submit(self._run, u_file, compact)
+
+    @property
+    def progress(self):
+        return self.done_bytes / self.total_bytes if self.total_bytes else 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+    def wait(self, timeout):
+        # Returns as soon as the parse finishes, or after timeout seconds
+        wait([self.future], timeout)
+
+    def _report(self, done, total):
+        # Called from the parser between blocks: the only point where a parse can be stopped
+        if self._cancelled.is_set():
+            raise ParseCancelled(f'Parse of {self.key} cancelled')
+        self.done_bytes, self.total_bytes = done, total
+
+    def _run(self, u_file, compact):
+        try:
+            return get_parse_cache().get_or_create(
+                self.key, lambda: open_or_parse(self.key, u_file, compact, self._report),
+                lambda dataset: dataset.nbytes)
+        finally:
+            with _jobs_lock:
+                if _parse_jobs.get(self.key) is self:
+                    del _parse_jobs[self.key]
+
+    def release(self):
+        with _jobs_lock:
+            self._holders -= 1
+            if self._holders <= 0 and not self.future.done():
+                self._cancelled.set()
+                if _parse_jobs.get(self.key) is self:
+                    del _parse_jobs[self.key]
+
+class ParseTicket:
+    # A session's hold on a parse job, released when the session replaces or drops it. The hold is
+    # taken by start_las_dataset while it hands the job out, so no other session's release can
+    # cancel the job in between
+    def __init__(self, job):
+        self.job = job
+        weakref.finalize(self, job.release)
+
+
+_parse_pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='las-parse')
+_parse_jobs = {}
+_jobs_lock = threading.Lock()
+
+def start_las_dataset(u_file, compact=False, key=None):
+    # A ticket on the job loading an upload: already finished when the well is cached, otherwise
+    # parsing in the background; sessions uploading the same bytes at the same time share one job.
+    # key is the upload's las_dataset_key when the caller already knows it
+    key = key or las_dataset_key(u_file, compact)
+    dataset = get_parse_cache().get(key)
+    with _jobs_lock:
+        if dataset is not None:
+            job = ParseJob(key, dataset=dataset)
+        else:
+            job = _parse_jobs.get(key)
+            if job is None:
+                job = _parse_jobs[key] = ParseJob(key, u_file, compact)
+        job._holders += 1
+        return ParseTicket(job)
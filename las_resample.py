@@ -0,0 +1,118 @@
+# Import the required libraries
+import numpy as np
+import pandas as pd
+from las_cache import LruCache, frame_hash
+from las_processing import CurveStats, get_depth_index
+
+# Budget for resampled selections, shared by every session of the server
+RESAMPLE_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+_resample_cache = LruCache(RESAMPLE_CACHE_MAX_BYTES)
+
+# A grid step far below the file's spacing would only multiply the rows
+RESAMPLE_MAX_ROWS = 10_000_000
+
+# Steps within this fraction of the median step count as regular
+DEPTH_STEP_TOLERANCE = 0.01
+
+RESAMPLE_METHODS = ['Nearest', 'Linear', 'Block average']
+
+
+def depth_spacing(depth):
+    # Median, smallest and largest step of the sorted depth curve (repeated depths left out)
+    steps = np.diff(depth)
+    steps = steps[steps > 0]
+    if not len(steps):
+        return {'step': 0.0, 'min': 0.0, 'max': 0.0, 'regular': True}
+    step = float(np.median(steps))
+    low, high = float(steps.min()), float(steps.max())
+    return {'step': step, 'min': low, 'max': high,
+            'regular': high - low <= DEPTH_STEP_TOLERANCE * step and len(steps) == len(depth) - 1}
+
+def get_depth_spacing(df, depth_column):
+    key = ('spacing', frame_hash(df, [depth_column]))
+    return _resample_cache.get_or_create(key, lambda: depth_spacing(_sorted_depth(df, depth_column)[0]),
+                                         lambda spacing: 256)
+
+def _sorted_depth(df, depth_column):
+    # Depth in increasing order without nulls, and the rows it comes from
+    index = get_depth_index(df, depth_column)
+    n_valid = int(np.count_nonzero(~np.isnan(index.sorted)))
+    if index.order is not None:
+        rows = index.order[:n_valid]
+    elif index.decreasing:
+        rows = np.arange(index.n_rows - 1, -1, -1)
+    else:
+        rows = slice(None)
+    return index.sorted[:n_valid], rows
+
+def depth_grid(top, base, step):
+    # Multiples of step, so wells resampled with the same step share their grid points
+    first, last = np.ceil(top / step - 1e-9), np.floor(base / step + 1e-9)
+    n_rows = int(last - first) + 1
+    if n_rows > RESAMPLE_MAX_ROWS:
+        raise ValueError(f'a {step:g} step gives {n_rows} rows, more than {RESAMPLE_MAX_ROWS}')
+    return (first + np.arange(max(n_rows, 0))) * step
+
+def resample_frame(df, depth_column, step, method):
+    # Every curve onto a regular grid of the depth column, in one vectorized pass per method:
+    # - Nearest: the value of the closest sample
+    # - Linear: interpolated between the two samples around each grid point
+    # - Block average: mean of the samples within half a step of each grid point (for coarser grids)
+    # Grid points farther than max(step, file step) from any sample are left missing, so gaps
+    # between runs are not bridged. Depth comes out increasing
+    if not step > 0:
+        raise ValueError('the grid step must be positive')
+    depth, rows = _sorted_depth(df, depth_column)
+    curves = [column for column in df.columns if column != depth_column]
+    values = df[curves].to_numpy(dtype=np.float64)[rows]
+    if not len(depth):
+        return df.iloc[:0]
+
+    grid = depth_grid(depth[0], depth[-1], step)
+    if method == 'Block average':
+        cells = np.rint(depth / step).astype(np.int64) - int(np.rint(grid[0] / step))
+        inside = (cells >= 0) & (cells < len(grid))
+        resampled = np.full((len(grid), len(curves)), np.nan)
+        for j in range(len(curves)):
+            valid = inside & ~np.isnan(values[:, j])
+            counts = np.bincount(cells[valid], minlength=len(grid))
+            sums = np.bincount(cells[valid], weights=values[valid, j], minlength=len(grid))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                resampled[:, j] = sums / counts
+    else:
+        # Samples around each grid point: depth[left] <= grid <= depth[right]
+        right = np.searchsorted(depth, grid).clip(0, len(depth) - 1)
+        left = (right - 1).clip(0)
+        d0, d1 = depth[left], depth[right]
+        if method == 'Nearest':
+            resampled = values[np.where(grid - d0 <= d1 - grid, left, right)]
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                weight = np.where(d1 > d0, (grid - d0) / (d1 - d0), 0.0)[:, None]
+            resampled = values[left] + weight * (values[right] - values[left])
+            # A grid point on a sample takes its value even when the other neighbour is missing
+            resampled = np.where(weight == 0, values[left], np.where(weight == 1, values[right], resampled))
+
+        tolerance = max(step, depth_spacing(depth)['step'])
+        gap = np.minimum(np.abs(grid - d0), np.abs(d1 - grid)) > tolerance
+        resampled[gap] = np.nan
+
+    # Compact (float32 or small integer) curves stay float32; depth is always float64
+    columns = {depth_column: grid}
+    for j, column in enumerate(curves):
+        columns[column] = resampled[:, j].astype(np.result_type(df[column].dtype, np.float32))
+    resampled_df = pd.DataFrame(columns, index=pd.RangeIndex(1, len(grid) + 1))
+    return resampled_df[list(df.columns)]
+
+def get_resampled(df, depth_column, step, method, data_key=None):
+    # Resampled selection and its statistics, memoized by (data, columns, grid); data_key identifies
+    # df cheaply when it comes straight from a dataset
+    key = ('resampled', data_key or frame_hash(df), tuple(df.columns), depth_column, step, method)
+
+    def resample():
+        resampled = resample_frame(df, depth_column, step, method)
+        return resampled, CurveStats.from_frame(resampled, quantiles=False)
+
+    return _resample_cache.get_or_create(key, resample,
+                                         lambda entry: int(entry[0].memory_usage(index=True).sum()))
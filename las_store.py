@@ -0,0 +1,77 @@
+# Import the required libraries
+import json
+import os
+import tempfile
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+# Parsed wells are kept on disk as uncompressed Feather (Arrow IPC) files so they can be memory-mapped
+STORE_DIR = os.environ.get('LAS_STORE_DIR', os.path.join(tempfile.gettempdir(), 'las_explorer_store'))
+STORE_MAX_BYTES = 20 * 1024 ** 3
+
+HEADER_METADATA_KEY = b'las_header'
+
+
+def _store_path(key):
+    return os.path.join(STORE_DIR, f'{key}.feather')
+
+def _prune_store():
+    # Least recently opened files (oldest mtime) go first once the store is over budget
+    entries = []
+    for name in os.listdir(STORE_DIR):
+        path = os.path.join(STORE_DIR, name)
+        if name.endswith('.feather'):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= STORE_MAX_BYTES:
+            break
+        os.remove(path)
+        total -= size
+
+def write_dataset(key, df, header):
+    # The store is only an accelerator: a read-only or full disk must not break the upload
+    try:
+        os.makedirs(STORE_DIR, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[HEADER_METADATA_KEY] = json.dumps(header, default=str).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+        # Write under a unique temporary name (two threads may store the same well at once) so other
+        # sessions never open a half-written file
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{key}.', suffix='.tmp', dir=STORE_DIR)
+        os.close(fd)
+        try:
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, _store_path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        _prune_store()
+    except OSError:
+        pass
+
+def has_dataset(key):
+    return os.path.exists(_store_path(key))
+
+def open_dataset(key):
+    # Returns the memory-mapped Arrow table and the header, or None if the well was never stored
+    path = _store_path(key)
+    try:
+        table = feather.read_table(path, memory_map=True)
+        os.utime(path)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    header = json.loads(table.schema.metadata[HEADER_METADATA_KEY])
+    return table, header
+
+def table_to_df(table, columns=None):
+    # Only the projected columns are copied out of the memory map
+    if columns is not None:
+        table = table.select(list(columns))
+    df = table.to_pandas()
+    df.index = pd.RangeIndex(1, table.num_rows + 1)
+    return df